@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtCore import Qt
 
@@ -102,4 +103,6 @@ def run():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos del preprocesado en ejecutables empaquetados
+    multiprocessing.freeze_support()
     run()
\ No newline at end of file
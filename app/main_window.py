@@ -1,5 +1,6 @@
 import json
 import os
+import time
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QMessageBox, 
                              QProgressBar, QTabWidget, QScrollArea, QGridLayout,
@@ -7,6 +8,8 @@ from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
 from PyQt6.QtCore import QThread, pyqtSignal, QObject, Qt
 from PyQt6.QtGui import QPixmap, QFont
 from bot.drawing_bot import DrawingBot
+from bot.input_backend import PyAutoGUIBackend
+from bot.pacing import calibrate_pacing, save_custom_profile
 from pynput import keyboard, mouse 
 
 class KeyboardListener(QThread):
@@ -49,10 +52,14 @@ class MouseClickListener(QThread):
 class Worker(QObject):
     finished = pyqtSignal()
     progress = pyqtSignal(str)
+    plan_ready = pyqtSignal(float)
+    progress_event = pyqtSignal(dict)
     
     def __init__(self, bot):
         super().__init__()
         self.bot = bot
+        self.bot.plan_callback = self.plan_ready.emit
+        self.bot.progress_event_callback = self.progress_event.emit
     
     def run(self):
         try:
@@ -62,6 +69,24 @@ class Worker(QObject):
             self.progress.emit(f"Error: {str(e)}")
             self.finished.emit()
 
+class PacingCalibrationWorker(QObject):
+    finished = pyqtSignal()
+    progress = pyqtSignal(str)
+
+    def __init__(self, canvas_region):
+        super().__init__()
+        self.canvas_region = canvas_region
+
+    def run(self):
+        try:
+            pacing = calibrate_pacing(PyAutoGUIBackend(), self.canvas_region, progress_callback=self.progress.emit)
+            save_custom_profile(pacing)
+            self.progress.emit(f"Ritmo calibrado (trazo {pacing['stroke_before'] + pacing['stroke_after']:.3f}s) "
+                               "y guardado como 'Personalizado'")
+        except Exception as e:
+            self.progress.emit(f"Error calibrando ritmo: {str(e)}")
+        self.finished.emit()
+
 class ColorCalibrationWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -736,6 +761,32 @@ class MainWindow(QMainWindow):
         mode_layout.addWidget(self.smart_mode_radio) # <-- AÑADE ESTA LÍNEA
         layout.addWidget(mode_group)
 
+        # Perfil de ritmo: las pausas que usa el bot entre eventos
+        pacing_group = QGroupBox("Ritmo de Dibujo")
+        pacing_layout = QHBoxLayout(pacing_group)
+        self.pacing_combo = QComboBox()
+        for key, name in [("safe", "Seguro"), ("normal", "Normal"),
+                          ("aggressive", "Agresivo"), ("custom", "Personalizado")]:
+            self.pacing_combo.addItem(name, key)
+        self.pacing_combo.setCurrentIndex(1)
+        pacing_layout.addWidget(self.pacing_combo)
+        self.calibrate_pacing_button = QPushButton("⏱️ Calibrar Ritmo")
+        self.calibrate_pacing_button.clicked.connect(self.start_pacing_calibration)
+        pacing_layout.addWidget(self.calibrate_pacing_button)
+        layout.addWidget(pacing_group)
+
+        # Tiempo límite de la ronda: el bot ajusta el plan para terminar a tiempo
+        budget_group = QGroupBox("Tiempo Límite")
+        budget_layout = QHBoxLayout(budget_group)
+        self.time_budget_spin = QSpinBox()
+        self.time_budget_spin.setRange(0, 900)
+        self.time_budget_spin.setSingleStep(10)
+        self.time_budget_spin.setSuffix(" s")
+        self.time_budget_spin.setSpecialValueText("Sin límite")
+        budget_layout.addWidget(self.time_budget_spin)
+        self.eta_label = QLabel("Fin previsto: --")
+        budget_layout.addWidget(self.eta_label)
+        layout.addWidget(budget_group)
 
         button_layout = QHBoxLayout()
         self.load_button = QPushButton("📁 Cargar Imagen")
@@ -797,6 +848,8 @@ class MainWindow(QMainWindow):
         try:
            #self.bot = DrawingBot(self.image_path, canvas_region) esta se borra?
             canvas_region = self.canvas_calibration_tab.get_canvas_region()
+            pacing = self.pacing_combo.currentData()
+            time_budget = self.time_budget_spin.value() or None
 
             # REEMPLAZA EL BLOQUE ANTERIOR CON ESTE
             if self.smart_mode_radio.isChecked():
@@ -811,7 +864,7 @@ class MainWindow(QMainWindow):
                 exact_color_coords = self.exact_color_calibration_tab.get_coords()
 
                 # Pasar AMBAS configuraciones al bot
-                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode, brush_coords=brush_coords, exact_color_coords=exact_color_coords)
+                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode, brush_coords=brush_coords, exact_color_coords=exact_color_coords, pacing=pacing, time_budget=time_budget)
                 
             elif self.exact_mode_radio.isChecked():
                 mode = 'exact'
@@ -819,11 +872,11 @@ class MainWindow(QMainWindow):
                     QMessageBox.warning(self, "Falta Calibración", "Ve a 'Calibrar Color Exacto' y calibra las coordenadas primero.")
                     return
                 exact_color_coords = self.exact_color_calibration_tab.get_coords()
-                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode, exact_color_coords=exact_color_coords)
+                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode, exact_color_coords=exact_color_coords, pacing=pacing, time_budget=time_budget)
 
             else: # Modo Paleta
                 mode = 'palette'
-                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode)
+                self.bot = DrawingBot(self.image_path, canvas_region, mode=mode, pacing=pacing, time_budget=time_budget)
 
             self.drawing_thread = QThread()
             self.worker = Worker(self.bot)
@@ -831,10 +884,15 @@ class MainWindow(QMainWindow):
             
             self.worker.finished.connect(self.drawing_thread.quit)
             self.worker.progress.connect(self.update_progress)
+            self.worker.plan_ready.connect(self.update_eta)
+            self.worker.progress_event.connect(self.update_progress_bar)
             self.drawing_thread.started.connect(self.worker.run)
             self.drawing_thread.finished.connect(self.drawing_finished)
             
             self.toggle_ui_state(is_drawing=True)
+            # Sin plan todavía la barra queda en modo ocupado
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.setFormat("%p%")
             self.progress_bar.setVisible(True)
             
             self.drawing_thread.start()
@@ -843,8 +901,66 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "Error", f"Error iniciando dibujo: {str(e)}")
             self.toggle_ui_state(is_drawing=False)
 
+    def start_pacing_calibration(self):
+        reply = QMessageBox.question(self, "Calibrar Ritmo",
+                                     "El bot dibujará trazos cortos de prueba en la parte inferior izquierda del canvas\n"
+                                     "para encontrar las pausas más rápidas que tu equipo dibuja sin fallos.\n"
+                                     "Asegúrate de que Gartic Phone esté visible con un color oscuro seleccionado.\n"
+                                     "¿Continuar?",
+                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+
+        canvas_region = self.canvas_calibration_tab.get_canvas_region()
+        self.drawing_thread = QThread()
+        self.worker = PacingCalibrationWorker(canvas_region)
+        self.worker.moveToThread(self.drawing_thread)
+
+        self.worker.finished.connect(self.drawing_thread.quit)
+        self.worker.progress.connect(self.update_progress)
+        self.drawing_thread.started.connect(self.worker.run)
+        self.drawing_thread.finished.connect(self.pacing_calibration_finished)
+
+        self.toggle_ui_state(is_drawing=True)
+        self.drawing_thread.start()
+
+    def pacing_calibration_finished(self):
+        self.toggle_ui_state(is_drawing=False)
+        self.pacing_combo.setCurrentIndex(self.pacing_combo.findData("custom"))
+
+        self.worker = None
+        if self.drawing_thread:
+            self.drawing_thread.deleteLater()
+            self.drawing_thread = None
+
+    def update_eta(self, seconds):
+        finish = time.strftime('%H:%M:%S', time.localtime(time.time() + seconds))
+        self.eta_label.setText(f"Fin previsto: {finish} (~{seconds:.0f}s)")
+
     def update_progress(self, message):
         self.status_label.setText(f"Estado: {message}")
+
+    def update_progress_bar(self, event):
+        """Refleja en la barra y en el tiempo restante un evento de progreso del bot"""
+        phase_names = {'preprocess': "Preparando", 'countdown': "Cuenta atrás", 'drawing': "Dibujando",
+                       'done': "Terminado", 'cancelled': "Cancelado"}
+        total = event['strokes_total']
+        if total:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(min(event['strokes_done'], total))
+        else:
+            self.progress_bar.setRange(0, 0)
+        layer_text = f"capa {event['layer']}/{event['layers']} · " if event['layers'] else ""
+        # Mientras faltan capas por compilar el total es una extrapolación
+        total_text = "~%m" if event.get('estimated') else "%m"
+        self.progress_bar.setFormat(f"{phase_names[event['phase']]}: {layer_text}%v/{total_text} trazos (%p%)")
+
+        eta = event['eta_seconds']
+        if eta is None:
+            return
+        finish = time.strftime('%H:%M:%S', time.localtime(time.time() + eta))
+        self.eta_label.setText(f"Quedan ~{eta:.0f}s (fin {finish}) · {event['events_per_second']:.0f} ev/s · "
+                               f"{event['color_switches']} cambios de color")
     
     def toggle_pause(self):
         if self.bot and self.drawing_thread and self.drawing_thread.isRunning():
@@ -870,6 +986,7 @@ class MainWindow(QMainWindow):
     def toggle_ui_state(self, is_drawing):
         self.draw_button.setEnabled(not is_drawing)
         self.load_button.setEnabled(not is_drawing)
+        self.calibrate_pacing_button.setEnabled(not is_drawing)
         self.tabs.setTabEnabled(1, not is_drawing) # Bloquear calibración mientras dibuja
         self.tabs.setTabEnabled(2, not is_drawing)
         self.tabs.setTabEnabled(3, not is_drawing) # <-- AÑADE ESTA LÍNEA (ajusta el número si el orden cambió)
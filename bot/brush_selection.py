@@ -0,0 +1,132 @@
+import numpy as np
+import cv2
+from bot.stroke_plan import scan_line_mask
+
+# Pinceles de Gartic Phone: (clave, diámetro en px, paso de dibujo, grosor mínimo para elegirlo)
+BRUSHES = (
+    ('brush_1', 23, 18, 18),
+    ('brush_2', 18, 14, 12),
+    ('brush_3', 14, 11, 8),
+    ('brush_4', 9, 7, 4),
+    ('brush_5', 3, 2, 0),
+)
+
+BRUSH_KEYS = tuple(key for key, _, _, _ in BRUSHES)
+
+# Píxeles que se tolera que un pincel se salga de la capa (lo mismo que ya desborda el pincel de 3 px)
+BRUSH_BLEED = 1
+
+# Por debajo de estos píxeles la capa es un detalle y va con el pincel más fino
+MIN_LAYER_PIXELS = 50
+
+
+def thickness_map(layer):
+    """Grosor local del trazo en los píxeles del eje medio de la capa (0 fuera del eje)"""
+    mask = (np.asarray(layer) > 0).astype(np.uint8)
+    # Borde de ceros para que el marco de la imagen cuente como fondo
+    padded = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    distance = cv2.distanceTransform(padded, cv2.DIST_L2, 3)[1:-1, 1:-1]
+
+    # El eje medio son los máximos locales de la distancia; ahí el grosor es 2·d - 1
+    ridge = (distance > 0) & (distance >= cv2.dilate(distance, np.ones((3, 3), np.uint8)) - 1e-3)
+    return np.where(ridge, 2 * distance - 1, 0)
+
+
+def thickness_histogram(layer):
+    """Histograma de grosores de la capa: posición = grosor en px, valor = píxeles del eje medio"""
+    widths = thickness_map(layer)
+    ridge_widths = np.rint(widths[widths > 0]).astype(np.int64)
+    return np.bincount(ridge_widths)
+
+
+def brush_diameter(brush_key):
+    """Diámetro en píxeles de un pincel"""
+    return {key: diameter for key, diameter, _, _ in BRUSHES}[brush_key]
+
+
+def diameter_for_step(step):
+    """Diámetro del pincel al que corresponde un paso de dibujo (el propio paso si no hay ninguno)"""
+    for _, diameter, brush_step, _ in BRUSHES:
+        if brush_step == step:
+            return diameter
+    return step
+
+
+def closest_brush(thickness, brush_keys=None):
+    """Pincel cuyo diámetro más se parece a un grosor de línea (entre 'brush_keys' si se indican)"""
+    candidates = [(key, diameter) for key, diameter, _, _ in BRUSHES if brush_keys is None or key in brush_keys]
+    return min(candidates, key=lambda item: abs(item[1] - thickness))[0]
+
+
+def brush_for_thickness(thickness):
+    """Pincel y paso adecuados para un grosor de trazo dado"""
+    for brush_key, _, step, min_thickness in BRUSHES:
+        if thickness > min_thickness:
+            return brush_key, step
+    return BRUSHES[-1][0], BRUSHES[-1][2]
+
+
+def mean_thickness(histogram):
+    """Grosor medio (px) a partir del histograma de grosores (0 si está vacío)"""
+    if histogram.sum() == 0:
+        return 0.0
+    return float(np.average(np.arange(len(histogram)), weights=histogram))
+
+
+def select_brush(layer):
+    """Elige pincel y paso según el grosor medio real de la capa -> (pincel, paso, histograma de grosores)"""
+    histogram = thickness_histogram(layer)
+    if np.count_nonzero(layer) < MIN_LAYER_PIXELS or histogram.sum() == 0:
+        brush_key, _, step, _ = BRUSHES[-1]
+        return brush_key, step, histogram
+
+    brush_key, step = brush_for_thickness(mean_thickness(histogram))
+    return brush_key, step, histogram
+
+
+def brush_kernel(diameter):
+    """Huella circular de un pincel de 'diameter' píxeles"""
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (diameter, diameter))
+
+
+def decompose_layer(layer, interior_brushes=('brush_1', 'brush_2'), edge_brushes=('brush_4', 'brush_5'),
+                    step_scale=1.0, orientation='horizontal'):
+    """Divide la capa en un interior para pinceles gruesos y una banda de borde para pinceles finos.
+
+    Cada pincel recibe la zona donde puede apoyar su centro sin salirse de la capa (erosión)
+    y que aún tenga algo por pintar. El último pincel de borde se queda con lo que sobre
+    (una franja estrecha que conviene trazar siguiendo su contorno).
+    Lo cubierto se calcula sobre las líneas de barrido (en 'orientation') que realmente se trazan
+    con el paso de cada pincel.
+    Devuelve una lista de (pincel, paso, máscara de centros) de más grueso a más fino.
+    """
+    brushes = {key: (diameter, step) for key, diameter, step, _ in BRUSHES}
+    mask = (np.asarray(layer) > 0).astype(np.uint8)
+    remaining = mask.copy()
+    parts = []
+
+    ordered = list(interior_brushes) + list(edge_brushes)
+    for n, brush_key in enumerate(ordered):
+        if not remaining.any():
+            break
+        diameter, step = brushes[brush_key]
+        step = max(1, int(round(step * step_scale)))
+        if n == len(ordered) - 1:
+            # El último pincel pinta directamente lo que queda, ensanchado solo lo que se tolera
+            # que se salga (BRUSH_BLEED) para no invadir los colores vecinos
+            parts.append((brush_key, step, cv2.dilate(remaining, brush_kernel(2 * BRUSH_BLEED + 1)) * 255))
+            break
+
+        kernel = brush_kernel(diameter)
+        # Centros donde el pincel cabe (salvo BRUSH_BLEED px) y su huella toca algo pendiente
+        fit = brush_kernel(max(1, diameter - 2 * BRUSH_BLEED))
+        centers = cv2.erode(mask, fit, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+        centers &= cv2.dilate(remaining, kernel)
+        if not centers.any():
+            continue
+
+        parts.append((brush_key, step, centers * 255))
+        drawn = centers & scan_line_mask(centers.shape, step, orientation)
+        remaining &= 1 - cv2.dilate(drawn, kernel)
+
+    return parts
@@ -0,0 +1,49 @@
+import numpy as np
+from sklearn.cluster import KMeans
+
+# Bits por canal del histograma: 5 bits -> como mucho 32^3 = 32768 colores distintos que agrupar
+HISTOGRAM_BITS = 5
+
+
+def quantized_histogram(pixels, bits=HISTOGRAM_BITS):
+    """Reduce los píxeles (N, 3) a un histograma cuantizado -> (colores medios de cada celda, recuentos)"""
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    shift = 8 - bits
+    q = (pixels >> shift).astype(np.int64)
+    bins = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+
+    size = 1 << (3 * bits)
+    counts = np.bincount(bins, minlength=size)
+    used = np.flatnonzero(counts)
+
+    # Cada celda se representa por el color medio de sus píxeles, no por su esquina
+    means = np.empty((len(used), 3), dtype=np.float64)
+    for channel in range(3):
+        sums = np.bincount(bins, weights=pixels[:, channel], minlength=size)
+        means[:, channel] = sums[used] / counts[used]
+    return means, counts[used]
+
+
+def cluster_colors(pixels, num_colors, refine=False, random_state=42):
+    """Agrupa los colores con KMeans sobre el histograma ponderado -> (centros int, píxeles por centro)
+
+    El coste no depende del tamaño de la imagen sino del número de celdas ocupadas del
+    histograma. Con 'refine' se afinan los centros con unas pocas iteraciones sobre todos los píxeles.
+    """
+    colors, weights = quantized_histogram(pixels)
+    actual_clusters = min(num_colors, len(colors))
+    if actual_clusters < 1:
+        return np.empty((0, 3), dtype=int), np.empty(0, dtype=np.int64)
+
+    kmeans = KMeans(n_clusters=actual_clusters, random_state=random_state, n_init=3)
+    kmeans.fit(colors, sample_weight=weights)
+    centers = kmeans.cluster_centers_
+    counts = np.bincount(kmeans.labels_, weights=weights, minlength=actual_clusters)
+
+    if refine:
+        full = KMeans(n_clusters=actual_clusters, init=centers, n_init=1, max_iter=10)
+        full.fit(np.asarray(pixels, dtype=np.float64).reshape(-1, 3))
+        centers = full.cluster_centers_
+        counts = np.bincount(full.labels_, minlength=actual_clusters)
+
+    return centers.astype(int), counts.astype(np.int64)
@@ -0,0 +1,73 @@
+import numpy as np
+from bot.layer_engine import UNASSIGNED, weighted_distances
+
+# Error máximo aceptado (píxeles x distancia de color) por cada segundo de cambio de color ahorrado
+DEFAULT_MERGE_TRADEOFF = 4000
+
+# Coste aproximado de enviar un evento de entrada, además de las pausas configuradas
+EVENT_OVERHEAD = 0.01
+
+
+def exact_color_switch_cost(pacing):
+    """Estima los segundos de una ida y vuelta completa al selector de color exacto"""
+    # Abrir, tres campos (clic, ctrl+a, retroceso, hasta 3 dígitos) y cerrar
+    field = pacing['picker_field'] + 3 * pacing['picker_typing'] + 6 * EVENT_OVERHEAD
+    return pacing['picker_open'] + 3 * field + pacing['picker_close'] + 2 * EVENT_OVERHEAD
+
+
+def plan_color_merges(colors, pixel_counts, switch_cost, tradeoff=DEFAULT_MERGE_TRADEOFF, drawable=None,
+                      max_colors=None):
+    """Fusiona los colores que aportan pocos píxeles en su vecino más cercano mientras compense el tiempo ahorrado.
+
+    En cada paso se elige la fusión que menos error introduce (píxeles del color x distancia
+    al vecino) y se aplica si ese error es menor que 'tradeoff' por segundo ahorrado, o
+    siempre mientras queden más de 'max_colors' colores.
+    Devuelve el array de reasignación (índice original -> índice final) y un resumen.
+    """
+    num_colors = len(colors)
+    mapping = np.arange(num_colors)
+    counts = np.asarray(pixel_counts, dtype=np.float64).copy()
+    active = counts > 0
+    if drawable is not None:
+        active &= np.asarray(drawable, dtype=bool)
+    switches_before = int(np.count_nonzero(active))
+
+    distances = weighted_distances(colors, colors) if num_colors else np.zeros((0, 0))
+    np.fill_diagonal(distances, np.inf)
+
+    while np.count_nonzero(active) > 1:
+        over_limit = max_colors is not None and np.count_nonzero(active) > max_colors
+        if tradeoff <= 0 and not over_limit:
+            break
+
+        candidates = np.flatnonzero(active)
+        neighbour_distances = distances[np.ix_(candidates, candidates)]
+        nearest = np.argmin(neighbour_distances, axis=1)
+        losses = counts[candidates] * neighbour_distances[np.arange(len(candidates)), nearest]
+
+        best = int(np.argmin(losses))
+        if losses[best] >= tradeoff * switch_cost and not over_limit:
+            break
+
+        source, target = candidates[best], candidates[nearest[best]]
+        mapping[mapping == source] = target
+        counts[target] += counts[source]
+        counts[source] = 0
+        active[source] = False
+
+    switches_after = int(np.count_nonzero(active))
+    report = {
+        'switches_before': switches_before,
+        'switches_after': switches_after,
+        'switches_saved': switches_before - switches_after,
+        'seconds_saved': (switches_before - switches_after) * switch_cost,
+    }
+    return mapping, report
+
+
+def apply_color_merges(label_map, mapping):
+    """Reasigna las etiquetas del mapa según la fusión de colores"""
+    merged = label_map.copy()
+    assigned = label_map != UNASSIGNED
+    merged[assigned] = mapping[label_map[assigned]]
+    return merged
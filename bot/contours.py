@@ -0,0 +1,37 @@
+import numpy as np
+import cv2
+
+
+def extract_polylines(layer, tolerance):
+    """Contornos exteriores e interiores de la capa simplificados con approxPolyDP -> [array (N, 2) de (x, y)]
+
+    Cada contorno se devuelve cerrado (el último punto repite el primero) salvo los de un solo punto.
+    """
+    mask = (np.asarray(layer) > 0).astype(np.uint8)
+    contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    polylines = []
+    for contour in contours:
+        points = cv2.approxPolyDP(contour, tolerance, True).reshape(-1, 2)
+        if len(points) > 1:
+            points = np.vstack([points, points[:1]])
+        polylines.append(points)
+    return polylines
+
+
+def split_outline_fill(layer, diameter):
+    """Separa la capa en polilíneas de contorno y la máscara de relleno que queda para el barrido.
+
+    El contorno, trazado con un pincel de 'diameter' px y simplificado con esa misma tolerancia,
+    cubre la franja del borde; el relleno son los píxeles a más de un cuarto de pincel de él,
+    para que ambos solapen aunque el barrido salte filas.
+    """
+    diameter = max(1, int(diameter))
+    polylines = extract_polylines(layer, max(1.0, diameter / 2))
+
+    # El borde tiene distancia 1; el pincel sobre él cubre hasta 1 + diameter / 2 hacia dentro,
+    # así que el relleno empieza con medio pincel de solape
+    mask = cv2.copyMakeBorder((np.asarray(layer) > 0).astype(np.uint8), 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    distance = cv2.distanceTransform(mask, cv2.DIST_L2, 3)[1:-1, 1:-1]
+    fill = (distance > 1.5 + diameter / 4).astype(np.uint8)
+    return polylines, fill * 255
@@ -0,0 +1,96 @@
+import numpy as np
+from bot.stroke_plan import estimate_duration
+
+# Opciones que prueba el planificador, de mayor a menor calidad:
+# primero se engrosa el paso entre filas y, dentro de cada paso, se reducen los colores
+DEADLINE_STEP_SCALES = (1.0, 1.5, 2.0, 3.0, 4.0)
+DEADLINE_COLOR_LIMITS = (None, 24, 12, 6, 3)
+
+
+def count_switches(plan, field):
+    """Cuenta cuántas veces cambia un campo (color_id o brush_id) a lo largo del plan, incluida la primera selección"""
+    if len(plan) == 0:
+        return 0
+    return 1 + int(np.count_nonzero(np.diff(plan[field])))
+
+
+def estimate_total_seconds(plan, pacing, color_switch_cost, brush_switch_cost=0.0):
+    """Estima la duración total de un plan: trazos, cambios de color y cambios de pincel"""
+    seconds = estimate_duration(plan, pacing['stroke_before'], pacing['stroke_after'], pacing['stroke_drag'])
+    seconds += count_switches(plan, 'color_id') * color_switch_cost
+    if brush_switch_cost:
+        seconds += count_switches(plan, 'brush_id') * brush_switch_cost
+    return seconds
+
+
+def trim_plan_to_budget(plan, budget, pacing, color_switch_cost):
+    """Se queda con los trazos más largos que caben en el presupuesto, conservando el orden original"""
+    if len(plan) == 0:
+        return plan
+
+    stroke_cost = pacing['stroke_before'] + pacing['stroke_after']
+    moves = (plan['x_end'] != plan['x_start']) | (plan['y_end'] != plan['y'])
+    costs = np.where(plan['joined'], 0.0, stroke_cost) + np.where(moves, pacing['stroke_drag'], 0.0)
+    lengths = np.hypot(plan['x_end'].astype(np.float64) - plan['x_start'],
+                       plan['y_end'].astype(np.float64) - plan['y']) + 1
+
+    # Por orden de longitud; el primer trazo de cada color paga además el cambio de color
+    by_length = np.argsort(-lengths, kind='stable')
+    _, first_of_color = np.unique(plan['color_id'][by_length], return_index=True)
+    costs = costs[by_length]
+    costs[first_of_color] += color_switch_cost
+
+    fits = np.cumsum(costs) <= budget
+    keep = np.zeros(len(plan), dtype=bool)
+    keep[by_length[fits]] = True
+    return plan[keep]
+
+
+def first_fitting(options, fits):
+    """Búsqueda binaria del primer elemento de 'options' para el que fits() es cierto -> índice, o None si no cabe ninguno"""
+    low, high = 0, len(options) - 1
+    if not fits(options[high]):
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if fits(options[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    return high
+
+
+def fit_plan_to_deadline(time_left, compile_candidate, pacing, color_switch_cost, brush_switch_cost=0.0):
+    """Elige la combinación de mejor calidad cuyo plan termina dentro del tiempo que queda.
+
+    'time_left()' devuelve los segundos disponibles en ese momento: se consulta después de cada
+    compilación, así el tiempo de buscar también se descuenta. 'compile_candidate(step_scale, max_colors)'
+    debe devolver el plan compilado para esa combinación. En vez de probar las 25 combinaciones se busca
+    por bisección el paso más fino que cabe con el mínimo de colores y, en ese paso, el máximo de colores
+    que cabe (unas 6 compilaciones). Si ni la más barata cabe, se recorta su plan a los trazos más largos.
+    Devuelve el plan elegido y un resumen de la decisión.
+    """
+    compiled = {}
+
+    def fits(candidate):
+        if candidate not in compiled:
+            plan = compile_candidate(*candidate)
+            compiled[candidate] = plan, estimate_total_seconds(plan, pacing, color_switch_cost, brush_switch_cost)
+        return compiled[candidate][1] <= time_left()
+
+    fewest_colors = DEADLINE_COLOR_LIMITS[-1]
+    step_index = first_fitting([(step_scale, fewest_colors) for step_scale in DEADLINE_STEP_SCALES], fits)
+    if step_index is not None:
+        step_scale = DEADLINE_STEP_SCALES[step_index]
+        options = [(step_scale, max_colors) for max_colors in DEADLINE_COLOR_LIMITS]
+        candidate = options[first_fitting(options, fits)]
+        plan, seconds = compiled[candidate]
+        return plan, {'step_scale': candidate[0], 'max_colors': candidate[1], 'seconds': seconds,
+                      'strokes_dropped': 0}
+
+    step_scale, max_colors = DEADLINE_STEP_SCALES[-1], fewest_colors
+    plan, _ = compiled[(step_scale, max_colors)]
+    trimmed = trim_plan_to_budget(plan, max(0.0, time_left()), pacing, color_switch_cost + brush_switch_cost)
+    seconds = estimate_total_seconds(trimmed, pacing, color_switch_cost, brush_switch_cost)
+    return trimmed, {'step_scale': step_scale, 'max_colors': max_colors, 'seconds': seconds,
+                     'strokes_dropped': len(plan) - len(trimmed)}
@@ -0,0 +1,95 @@
+import numpy as np
+from bot.palette_lut import LUT_BITS, map_to_palette
+
+# numba es opcional (requirements.txt): si no está, la difusión de error corre en Python puro
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+DITHER_METHODS = ('none', 'ordered', 'floyd')
+
+# Matriz de Bayer 4x4 normalizada a umbrales en [-0.5, 0.5)
+BAYER_4 = (np.array([
+    [0, 8, 2, 10],
+    [12, 4, 14, 6],
+    [3, 11, 1, 9],
+    [15, 7, 13, 5],
+]) + 0.5) / 16 - 0.5
+
+# Amplitud del ruido ordenado (en niveles RGB): del orden de la separación entre colores de la paleta
+DITHER_STRENGTH = 48
+
+
+def block_means(image_array, cell):
+    """Reduce la imagen a la media de cada bloque de cell x cell píxeles (se rellenan los bordes)"""
+    rgb = np.asarray(image_array)[..., :3].astype(np.float64)
+    height, width = rgb.shape[:2]
+    pad_h, pad_w = -height % cell, -width % cell
+    if pad_h or pad_w:
+        rgb = np.pad(rgb, ((0, pad_h), (0, pad_w), (0, 0)), mode='edge')
+    blocks = rgb.reshape(rgb.shape[0] // cell, cell, rgb.shape[1] // cell, cell, 3)
+    return blocks.mean(axis=(1, 3))
+
+
+def ordered_dither(small, lut, bits=LUT_BITS, strength=DITHER_STRENGTH):
+    """Tramado ordenado (Bayer) totalmente vectorizado -> índices de paleta"""
+    height, width = small.shape[:2]
+    offsets = np.tile(BAYER_4, (height // 4 + 1, width // 4 + 1))[:height, :width] * strength
+    dithered = np.clip(small + offsets[..., None], 0, 255).astype(np.uint8)
+    return map_to_palette(dithered, lut, bits).astype(np.int16)
+
+
+def _diffuse_errors(work, palette, lut, shift):
+    """Floyd–Steinberg: cuantiza cada píxel con la tabla y reparte el error a sus vecinos"""
+    height, width = work.shape[0], work.shape[1]
+    labels = np.empty((height, width), dtype=np.int16)
+    for y in range(height):
+        for x in range(width):
+            r = min(max(int(work[y, x, 0]), 0), 255)
+            g = min(max(int(work[y, x, 1]), 0), 255)
+            b = min(max(int(work[y, x, 2]), 0), 255)
+            index = lut[r >> shift, g >> shift, b >> shift]
+            labels[y, x] = index
+            for c in range(3):
+                error = work[y, x, c] - palette[index, c]
+                if x + 1 < width:
+                    work[y, x + 1, c] += error * 7 / 16
+                if y + 1 < height:
+                    if x > 0:
+                        work[y + 1, x - 1, c] += error * 3 / 16
+                    work[y + 1, x, c] += error * 5 / 16
+                    if x + 1 < width:
+                        work[y + 1, x + 1, c] += error * 1 / 16
+    return labels
+
+
+_diffuse_errors_jit = njit(cache=True)(_diffuse_errors) if njit is not None else None
+
+
+def error_diffusion(small, palette_rgb, lut, bits=LUT_BITS):
+    """Tramado Floyd–Steinberg -> índices de paleta (compilado con numba si está disponible)"""
+    work = np.array(small, dtype=np.float64)
+    palette = np.asarray(palette_rgb, dtype=np.float64).reshape(-1, 3)
+    diffuse = _diffuse_errors_jit if _diffuse_errors_jit is not None else _diffuse_errors
+    return diffuse(work, palette, np.ascontiguousarray(lut), 8 - bits)
+
+
+def dither_to_palette(image_array, palette_rgb, lut, method='ordered', cell=1, bits=LUT_BITS):
+    """Trama la imagen a la paleta trabajando a la resolución del pincel -> mapa de índices a tamaño completo.
+
+    Cada bloque de cell x cell píxeles recibe un solo color, así el tramado nunca genera
+    trazos más cortos que el paso del pincel.
+    """
+    height, width = image_array.shape[:2]
+    cell = max(1, int(cell))
+    small = block_means(image_array, cell)
+
+    if method == 'ordered':
+        labels = ordered_dither(small, lut, bits)
+    elif method == 'floyd':
+        labels = error_diffusion(small, palette_rgb, lut, bits)
+    else:
+        labels = map_to_palette(np.clip(np.rint(small), 0, 255).astype(np.uint8), lut, bits).astype(np.int16)
+
+    return np.repeat(np.repeat(labels, cell, axis=0), cell, axis=1)[:height, :width]
@@ -1,16 +1,43 @@
-import pyautogui
-import time
 import json
+import time
 import threading
 import os
-from PIL import Image, ImageEnhance
+from PIL import ImageEnhance
 import numpy as np
-import cv2
-from sklearn.cluster import KMeans
 import colorsys
+from bot.layer_engine import UNASSIGNED, build_label_map, label_counts, layer_from_labels
+from bot.stroke_plan import (compile_layer, compile_best_orientation, compile_polylines, concat_plans, split_by_color,
+                             split_by_unit)
+from bot.input_backend import PyAutoGUIBackend
+from bot.preprocess_cache import PreprocessCache, hash_file
+from bot.stroke_order import order_plan, travel_distance
+from bot.pacing import get_pacing
+from bot.color_planner import (DEFAULT_MERGE_TRADEOFF, EVENT_OVERHEAD, exact_color_switch_cost,
+                               plan_color_merges, apply_color_merges)
+from bot.deadline_planner import estimate_total_seconds, fit_plan_to_deadline
+from bot.color_extraction import cluster_colors
+from bot.palette_lut import load_palette_lut, map_to_palette
+from bot.dithering import dither_to_palette
+from bot.brush_selection import (BRUSH_KEYS, select_brush, decompose_layer, brush_diameter, diameter_for_step, closest_brush,
+                                 mean_thickness, thickness_histogram)
+from bot.line_art import LINE_ART_MAX_LUMA, is_line_art, luma, skeleton_polylines, split_thin_thick
+from bot.contours import split_outline_fill
+from bot.work_schedule import chain_units, schedule_units
+from bot.stroke_merge import bridge_gaps, count_input_events, zigzag_runs
+from bot.plan_pipeline import PipelineClosed, PlanPipeline
+from bot.image_ingest import prepare_image
+from bot.progress import DrawingProgress
+
+# Ordenación de trazos por defecto de cada modo (ver bot.stroke_order)
+STROKE_ORDER_BY_MODE = {
+    'palette': 'nearest',
+    'exact': 'serpentine',
+    'smart': 'nearest',
+}
 
 class DrawingBot:
-    def __init__(self, image_path, canvas_region, mode='palette', exact_color_coords=None, brush_coords=None):
+    def __init__(self, image_path, canvas_region, mode='palette', exact_color_coords=None, brush_coords=None,
+                 input_backend=None, cache=None, pacing='normal', time_budget=None):
         self.image_path = image_path
         self.canvas_region = canvas_region
         self.mode = mode
@@ -30,13 +57,46 @@ class DrawingBot:
             print("🖌️ Modo Paleta seleccionado. Usando paso de dibujo medio (11px).")
         # Nota: El modo 'smart' define su propio brush_step dinámicamente, por lo que no necesita un valor aquí.
         # --- FIN DEL BLOQUE A AÑADIR ---
+        # Afinar los colores extraídos con KMeans sobre todos los píxeles (más lento)
+        self.refine_colors = False
+        # Segundos disponibles para terminar el dibujo (rondas con tiempo); None = sin límite
+        self.time_budget = time_budget
+        self.plan_callback = None
+        # Recibe los eventos de progreso estructurados (ver bot.progress.DrawingProgress)
+        self.progress_event_callback = None
+        self.drawing_progress = DrawingProgress()
+        self._start_time = time.monotonic()
+        # Error aceptado por segundo ahorrado al fusionar colores poco rentables (0 = no fusionar)
+        self.color_merge_tradeoff = DEFAULT_MERGE_TRADEOFF
+        # Orden de los trazos dentro de cada capa para reducir los saltos del puntero
+        self.stroke_order = STROKE_ORDER_BY_MODE.get(self.mode, 'serpentine')
+        # Distancia máxima para asignar un píxel a su color más cercano (None = cobertura total)
+        self.label_max_distance = None
+        # Tramado del modo paleta: 'ordered' (Bayer, rápido), 'floyd' (difusión de error) o 'none'
+        self.dither = 'ordered'
+        # Dibujar los bordes de cada capa como polilíneas de contorno (una sola pulsación) y rellenar por barrido
+        self.contour_strokes = False
+        # Orientación del barrido: 'auto' prueba filas, columnas y diagonales y elige la más rápida por capa
+        self.scan_direction = 'auto'
+        # Unir los tramos de una línea separados por huecos menores que el pincel (o que pinta una capa posterior)
+        self.bridge_gaps = True
+        # Encadenar también los tramos de líneas vecinas en una sola pulsación en zigzag
+        self.zigzag_strokes = False
+        self._events_saved = {}
+        # Modo línea (esqueleto de las capas oscuras): None = en modo inteligente se activa solo si la imagen
+        # lo parece; en los otros modos no hay pincel que elegir según el grosor y solo se usa si se pide
+        self.line_art = None
+        self.line_art_detected = False
         # Cargar paleta de colores
         self.load_palette()
         
 
-        # Configuración de pyautogui
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0
+        # Backend de entrada: pyautogui por defecto, o uno de grabación/nulo para pruebas sin escritorio
+        self.input = input_backend if input_backend is not None else PyAutoGUIBackend()
+        # Pausas del bot: nombre de un perfil de assets/pacing_profiles.json o un diccionario propio
+        self.pacing = get_pacing(pacing)
+        # Caché en disco del preprocesado para que los redibujos empiecen casi al instante
+        self.cache = cache if cache is not None else PreprocessCache()
                 
         # --- POR ESTE NUEVO DICCIONARIO ---
         self.available_colors = {
@@ -62,103 +122,521 @@ class DrawingBot:
                 
     # AÑADE ESTA FUNCIÓN NUEVA
     def _choose_best_brush(self, layer):
-        """Analiza una capa y elige el mejor pincel y paso de dibujo."""
-        # Contamos los píxeles totales para tener una idea general
-        total_pixels = np.sum(layer > 0)
-
-        # Si son muy pocos píxeles, es un detalle pequeño, usamos el pincel más fino
-        if total_pixels < 50:
-            return "brush_5", 2 # Pincel 3px, paso 2
-
-        # Analizamos el "grosor" promedio de las líneas en la capa
-        line_thicknesses = []
-        for row in layer:
-            # Encontrar segmentos de píxeles en la fila
-            segments = np.where(row > 0)[0]
-            if len(segments) > 0:
-                # Calcular la longitud de los segmentos contiguos
-                jumps = np.diff(segments) > 1
-                runs = np.split(segments, np.where(jumps)[0] + 1)
-                for run in runs:
-                    line_thicknesses.append(len(run))
-
-        if not line_thicknesses:
-            return "brush_5", 2 # Si no hay líneas, es detalle, pincel pequeño
-
-        avg_thickness = np.mean(line_thicknesses)
-
-        # Decidimos el pincel basado en el grosor promedio
-        if avg_thickness > 18:
-            return "brush_1", 18 # Pincel 23px, paso 18
-        elif avg_thickness > 12:
-            return "brush_2", 14 # Pincel 18px, paso 14
-        elif avg_thickness > 8:
-            return "brush_3", 11 # Pincel 14px, paso 11
-        elif avg_thickness > 4:
-            return "brush_4", 7  # Pincel 9px, paso 7
-        else:
-            return "brush_5", 2  # Pincel 3px, paso 2
+        """Analiza una capa y elige el mejor pincel y paso de dibujo según su grosor real (transformada de distancia)."""
+        return select_brush(layer)
 
     # REEMPLAZA TU FUNCIÓN draw_by_smart_mode ENTERA CON ESTA
     def draw_by_smart_mode(self, progress_callback=None):
         """Dibuja usando un pincel adecuado para cada capa de color."""
         try:
             progress_callback("Iniciando dibujo en MODO INTELIGENTE...")
-            time.sleep(3)
-            # Procesar imagen (igual que antes)
-            if self.image_path.lower().endswith('.png'):
-                pil_image = self._process_png_with_transparency(self.image_path)
-            else:
-                pil_image = Image.open(self.image_path).convert('RGB')
-            pil_image = self._enhance_image_quality(pil_image)
-            canvas_w, canvas_h = self.canvas_region[2], self.canvas_region[3]
-            pil_image.thumbnail((canvas_w, canvas_h), Image.Resampling.LANCZOS)
-            image_array = np.array(pil_image)
-            height, width = image_array.shape[:2]
-
-            drawn_mask = np.zeros((height, width), dtype=np.uint8)
 
-            progress_callback("Analizando colores...")
-            exact_colors = self._extract_dominant_colors(image_array, num_colors=50, map_to_palette=False)
-            if not exact_colors: raise Exception("No se pudieron detectar colores.")
-
-            total_colors = len(exact_colors)
-            for i, color in enumerate(exact_colors):
+            # Cada capa se compila con el pincel y paso que mejor le quedan y se dibuja por unidades
+            # (color, pincel) en cuanto está lista, mientras se preparan las siguientes
+            current_color = current_brush = None
+            color_switches = brush_switches = 0
+            layer_color, layer_number = None, 0
+            units = self._stream_plan(progress_callback, split=split_by_unit)
+            for n, (exact_colors, layer_count, i, brush_id, strokes) in enumerate(units):
                 if self._check_controls() == "cancel": break
-                if color[0] > 240 and color[1] > 240 and color[2] > 240: continue
-
-                # Crear la capa de color
-                layer = np.zeros((height, width), dtype=np.uint8)
-                for y in range(height):
-                    for x in range(width):
-                        pixel_color = tuple(image_array[y, x])
-                        distance = self._color_distance(pixel_color, color)
-                        if distance < 25:
-                            layer[y, x] = 255
-
-                # Quitar píxeles ya dibujados
-                layer[drawn_mask == 255] = 0
-
-                if np.any(layer):
-                    # --- EL CAMBIO CLAVE ---
-                    # 1. El bot elige el mejor pincel y paso para esta capa específica
-                    brush_key, self.brush_step = self._choose_best_brush(layer)
-
-                    progress_callback(f"Color {i+1}/{total_colors}: Usando pincel {brush_key} ({self.brush_step}px step)")
-
-                    # 2. Selecciona el color y el pincel elegido
-                    if not self._select_exact_color(tuple(map(int, color))): continue
-
-                    # 3. Dibuja la capa con el paso optimizado
-                    self._draw_layer_optimized(layer, "exact_mode")
-
-                    # 4. Actualiza la máscara de memoria
-                    drawn_mask[layer > 0] = 255
+                color = exact_colors[i]
+                brush_key = f"brush_{brush_id}"
+
+                progress_callback(f"Unidad {n+1}: color {i+1}/{len(exact_colors)} con pincel {brush_key}")
+                if i != layer_color:
+                    layer_color, layer_number = i, layer_number + 1
+                    self.drawing_progress.layer(layer_number, layer_count)
+
+                # Solo se cambia de pincel o de color cuando la unidad lo necesita
+                if brush_key != current_brush:
+                    if self._select_brush(brush_key):
+                        brush_switches += 1
+                        self.drawing_progress.switched(brush=True)
+                    current_brush = brush_key
+                if i != current_color:
+                    if not self._select_exact_color(tuple(map(int, color))):
+                        current_color = None
+                        # Los trazos omitidos cuentan como procesados para que el progreso llegue al final
+                        self.drawing_progress.advance(len(strokes), 0)
+                        continue
+                    current_color = i
+                    color_switches += 1
+                    self.drawing_progress.switched(color=True)
+                if not self._execute_plan(strokes): break
 
-            progress_callback("¡Dibujo inteligente completado!")
+            progress_callback(f"¡Dibujo inteligente completado! {brush_switches} cambios de pincel "
+                              f"y {color_switches} cambios de color")
         except Exception as e:
             progress_callback(f"Error en modo inteligente: {str(e)}")
             
+    def _prepare_image(self, image_hash=None):
+        """Carga la imagen una sola vez al tamaño del canvas, con su máscara de visibilidad y ya mejorada"""
+        canvas_w, canvas_h = self.canvas_region[2], self.canvas_region[3]
+        prepared = prepare_image(self.image_path, (canvas_w, canvas_h), self._enhance_image_quality, image_hash)
+        if prepared.visible is not None:
+            print("🔍 Detectada imagen con transparencia - manteniendo áreas transparentes")
+        else:
+            print("🔍 Imagen sin transparencia - procesando completa")
+        return prepared
+
+    def _color_switch_cost(self):
+        """Segundos que cuesta cambiar de color en el modo actual"""
+        if self.mode == 'palette':
+            return self.pacing['palette_click'] + EVENT_OVERHEAD
+        return exact_color_switch_cost(self.pacing)
+
+    def _brush_switch_cost(self):
+        """Segundos que cuesta cambiar de pincel (solo el modo inteligente cambia de pincel)"""
+        if self.mode == 'smart':
+            return self.pacing['brush_click'] + EVENT_OVERHEAD
+        return 0.0
+
+    def _estimate_plan_seconds(self, plan):
+        """Estima la duración de un plan con las pausas del perfil de ritmo actual, incluidos los cambios de color"""
+        return estimate_total_seconds(plan, self.pacing, self._color_switch_cost(), self._brush_switch_cost())
+
+    def _report_plan(self, plan, progress_callback):
+        """Anuncia el tamaño del plan y la hora prevista de finalización"""
+        seconds = self._estimate_plan_seconds(plan)
+        finish = time.strftime('%H:%M:%S', time.localtime(time.time() + seconds))
+        progress_callback(f"Plan listo: {len(plan)} trazos, ~{seconds:.0f}s de dibujo (fin previsto {finish})")
+        self.drawing_progress.plan_ready(len(plan), seconds)
+        if self.plan_callback:
+            self.plan_callback(seconds)
+
+    def _report_partial_plan(self, pieces, area_done, area_total):
+        """Publica en el progreso el total de trazos y la duración extrapolados de las capas compiladas"""
+        compiled = concat_plans(pieces)
+        factor = area_total / area_done if area_done else 1.0
+        self.drawing_progress.plan_ready(round(len(compiled) * factor),
+                                         self._estimate_plan_seconds(compiled) * factor, estimated=True)
+
+    def _cache_params(self):
+        """Parámetros de ajuste que afectan al preprocesado y forman parte de la clave de caché"""
+        return {
+            'num_colors': 50,
+            'refine_colors': self.refine_colors,
+            'brush_step': getattr(self, 'brush_step', None),
+            'label_max_distance': self.label_max_distance,
+            'dither': self.dither,
+            'contour_strokes': self.contour_strokes,
+            'scan_direction': self.scan_direction,
+            'bridge_gaps': self.bridge_gaps,
+            'zigzag_strokes': self.zigzag_strokes,
+            'line_art': self.line_art,
+            'stroke_order': self.stroke_order,
+            'color_merge_tradeoff': self.color_merge_tradeoff,
+            # Las fusiones de color dependen del coste de cambiar de color, que sale de las pausas
+            'pacing': {key: float(value) for key, value in self.pacing.items()},
+            # La descomposición por pinceles solo usa los calibrados
+            'brushes': list(self._calibrated_brushes(BRUSH_KEYS)) if self.mode == 'smart' else None,
+            # En modo paleta solo se dibujan los colores calibrados
+            'palette_colors': sorted(self.palette_data) if self.mode == 'palette' else None,
+        }
+
+    def _compile_color_layer(self, layer, color_id, step_scale=1.0, later_mask=None):
+        """Compila la capa de un color con el pincel y paso que corresponden al modo"""
+        if self.mode != 'smart':
+            step = max(1, int(round(self.brush_step * step_scale)))
+            plan, saved = self._compile_mask(layer, step, diameter_for_step(self.brush_step), color_id, 0,
+                                             later_mask=later_mask)
+            self._record_events_saved(color_id, saved)
+            return plan
+
+        brush_key, step, _ = self._choose_best_brush(layer)
+        step = max(1, int(round(step * step_scale)))
+        # La orientación de barrido se elige una vez por capa, con el paso de su pincel principal
+        _, orientation = self._compile_scan(layer, step, color_id, 0)
+        single, single_saved = self._compile_mask(layer, step, brush_diameter(brush_key), color_id,
+                                                  int(brush_key.split('_')[1]), orientation)
+        if brush_key in ('brush_4', 'brush_5'):
+            # Capa de trazos finos: no tiene interior que rellenar con pinceles gruesos
+            self._record_events_saved(color_id, single_saved)
+            return single
+
+        # Relleno con los pinceles gruesos que quepan y borde con los finos
+        parts = decompose_layer(layer, self._calibrated_brushes(('brush_1', 'brush_2')),
+                                self._calibrated_brushes(('brush_4', 'brush_5')), step_scale, orientation)
+        plans, decomposed_saved = [], 0
+        for n, (part_key, part_step, mask) in enumerate(parts):
+            # La franja final es estrecha: se prueba a trazarla siguiendo su contorno
+            plan, saved = self._compile_mask(mask, part_step, brush_diameter(part_key), color_id,
+                                             int(part_key.split('_')[1]), orientation,
+                                             contours=True if n == len(parts) - 1 else None)
+            plans.append(plan)
+            decomposed_saved += saved
+        decomposed = concat_plans(plans)
+
+        # Descomponer solo compensa si ahorra tiempo frente a la capa entera con su pincel principal
+        if self._estimate_plan_seconds(decomposed) < self._estimate_plan_seconds(single):
+            self._record_events_saved(color_id, decomposed_saved)
+            return decomposed
+        self._record_events_saved(color_id, single_saved)
+        return single
+
+    def _compile_scan(self, mask, step, color_id, brush_id, orientation=None):
+        """Compila una máscara por barrido en la orientación indicada o en la más rápida -> (plan, orientación)"""
+        if orientation is None and self.scan_direction != 'auto':
+            orientation = self.scan_direction
+        if orientation is not None:
+            return compile_layer(mask, step, color_id, brush_id, orientation), orientation
+        return compile_best_orientation(mask, step, color_id, brush_id, delay_before=self.pacing['stroke_before'],
+                                        delay_after=self.pacing['stroke_after'],
+                                        drag_duration=self.pacing['stroke_drag'])
+
+    def _merge_runs(self, plan, diameter, later_mask=None):
+        """Une tramos separados por huecos que el pincel ya cubre (y, opcionalmente, los de líneas vecinas en zigzag)
+        -> (plan, eventos de ratón ahorrados)"""
+        before = count_input_events(plan)
+        if self.bridge_gaps:
+            plan, _ = bridge_gaps(plan, max(0, diameter - 1), later_mask)
+        if self.zigzag_strokes:
+            plan, _ = zigzag_runs(plan, diameter)
+        return plan, before - count_input_events(plan)
+
+    def _record_events_saved(self, color_id, saved):
+        """Anota los eventos de ratón ahorrados al unir tramos en el plan que finalmente se usa para un color"""
+        if saved > 0:
+            self._events_saved[color_id] = self._events_saved.get(color_id, 0) + saved
+
+    def _compile_mask(self, mask, step, diameter, color_id, brush_id, orientation=None, later_mask=None,
+                      contours=None):
+        """Compila una máscara por barrido o, en modo contorno, con polilíneas más relleno por barrido
+        -> (plan, eventos ahorrados al unir tramos en ese plan)
+
+        'contours' fuerza (True) o descarta (False) el intento con contornos; None sigue el ajuste contour_strokes.
+        """
+        scanlines, orientation = self._compile_scan(mask, step, color_id, brush_id, orientation)
+        scanlines, scan_saved = self._merge_runs(scanlines, diameter, later_mask)
+        if not (self.contour_strokes if contours is None else contours):
+            return scanlines, scan_saved
+
+        polylines, fill = split_outline_fill(mask, diameter)
+        fill_plan, _ = self._compile_scan(fill, step, color_id, brush_id, orientation)
+        fill_plan, fill_saved = self._merge_runs(fill_plan, diameter, later_mask)
+        traced = concat_plans([fill_plan, compile_polylines(polylines, color_id=color_id, brush_id=brush_id)])
+        # Los contornos solo compensan en trazos largos y finos; en zonas moteadas se queda el barrido
+        if self._estimate_plan_seconds(traced) < self._estimate_plan_seconds(scanlines):
+            return traced, fill_saved
+        return scanlines, scan_saved
+
+    def _line_art_active(self):
+        """El modo línea se usa si se ha pedido o, en automático, si se ha detectado un dibujo de línea en modo inteligente"""
+        if self.line_art is not None:
+            return self.line_art
+        return self.line_art_detected and self.mode == 'smart'
+
+    def _compile_line_art(self, layer, color_id, step_scale=1.0):
+        """Dibuja los trazos finos de la capa como polilíneas de su esqueleto y rellena por barrido las zonas gruesas"""
+        # Más ancho que el pincel más grueso disponible ya no es una línea: se rellena
+        if self.mode == 'smart':
+            max_width = max(brush_diameter(key) for key in self._calibrated_brushes(BRUSH_KEYS))
+        else:
+            max_width = diameter_for_step(self.brush_step)
+        thin, thick = split_thin_thick(layer, max_width)
+
+        plans = []
+        if thick.any():
+            plans.append(self._compile_color_layer(thick, color_id, step_scale))
+        if thin.any():
+            polylines = skeleton_polylines(thin)
+            thickness = mean_thickness(thickness_histogram(thin))
+            brush_id = 0
+            if self.mode == 'smart':
+                brush_key = closest_brush(thickness, self._calibrated_brushes(BRUSH_KEYS))
+                brush_id = int(brush_key.split('_')[1])
+            plans.append(compile_polylines(polylines, color_id=color_id, brush_id=brush_id))
+        return concat_plans(plans)
+
+    def _calibrated_brushes(self, brush_keys):
+        """Filtra los pinceles con coordenadas calibradas (todos si no hay calibración)"""
+        if not self.brush_coords:
+            return brush_keys
+        calibrated = tuple(key for key in brush_keys if key in self.brush_coords)
+        # Siempre debe quedar al menos el pincel más fino para terminar el borde
+        return calibrated or brush_keys[-1:]
+
+    def _drawable_colors(self, colors):
+        """Indica qué colores se dibujan: el blanco es el fondo y en modo paleta el color debe estar calibrado"""
+        drawable = []
+        for color in colors:
+            # El blanco puro suele ser el fondo, lo omitimos para acelerar
+            is_white = color[0] > 240 and color[1] > 240 and color[2] > 240
+            if self.mode == 'palette':
+                drawable.append(not is_white and ','.join(map(str, color)) in self.palette_data)
+            else:
+                drawable.append(not is_white)
+        return drawable
+
+    def _plan_layers(self, colors, label_map, max_colors=None, progress_callback=None):
+        """Fusiona colores poco rentables y decide qué capas se dibujan y en qué orden -> (mapa, capas, rango)"""
+        pixel_counts = label_counts(label_map, len(colors))
+        drawable = self._drawable_colors(colors)
+
+        # Fusionar los colores que aportan pocos píxeles para ahorrar cambios de color
+        mapping, merge_report = plan_color_merges(colors, pixel_counts, self._color_switch_cost(),
+                                                  self.color_merge_tradeoff, drawable, max_colors)
+        if merge_report['switches_saved'] > 0:
+            label_map = apply_color_merges(label_map, mapping)
+            pixel_counts = label_counts(label_map, len(colors))
+        if progress_callback:
+            progress_callback(f"Colores: {merge_report['switches_after']} cambios de color "
+                              f"({merge_report['switches_saved']} ahorrados, ~{merge_report['seconds_saved']:.1f}s menos)")
+
+        # En modo paleta las zonas grandes van primero y los detalles encima;
+        # los colores exactos ya vienen ordenados por frecuencia.
+        # Solo se dibujan los colores que se pueden dibujar y tienen píxeles asignados
+        layer_order = range(len(colors))
+        if self.mode == 'palette':
+            layer_order = np.argsort(-pixel_counts, kind='stable').tolist()
+        layers = [i for i in layer_order if drawable[i] and pixel_counts[i] > 0]
+
+        # Posición de cada píxel en el orden de dibujo: un hueco se puede cruzar si lo pinta una capa posterior.
+        # En modo inteligente el orden lo decide después la programación por unidades, así que no se usa
+        draw_rank = None
+        if self.mode != 'smart':
+            ranks = np.full(len(colors) + 1, -1, dtype=np.int16)
+            for rank, i in enumerate(layers):
+                ranks[i] = rank
+            draw_rank = ranks[label_map]  # UNASSIGNED (-1) toma el último valor: -1
+        return label_map, layers, draw_rank
+
+    def _compile_ranked_layer(self, colors, label_map, draw_rank, rank, color_id, step_scale=1.0):
+        """Compila la capa de un color que ocupa la posición 'rank' en el orden de dibujo"""
+        layer = layer_from_labels(label_map, color_id)
+        later_mask = draw_rank > rank if draw_rank is not None else None
+        if not (self._line_art_active() and luma(colors[color_id]) < LINE_ART_MAX_LUMA):
+            return self._compile_color_layer(layer, color_id, step_scale, later_mask)
+
+        # El esqueleto solo compensa si es más rápido: en capas de borde suavizado se rompe en trozos sueltos
+        saved_before = dict(self._events_saved)
+        traced = self._compile_line_art(layer, color_id, step_scale)
+        traced_saved, self._events_saved = self._events_saved, saved_before
+        scanned = self._compile_color_layer(layer, color_id, step_scale, later_mask)
+        traced_seconds, scanned_seconds = self._estimate_plan_seconds(traced), self._estimate_plan_seconds(scanned)
+        if traced_seconds < scanned_seconds:
+            print(f"✏️ Color {color_id+1}: modo línea, ~{traced_seconds:.1f}s frente a ~{scanned_seconds:.1f}s por barrido")
+            self._events_saved = traced_saved
+            return traced
+        return scanned
+
+    def _report_events_saved(self, progress_callback):
+        """Anuncia los eventos de ratón ahorrados al unir tramos al compilar las capas"""
+        if progress_callback and self._events_saved:
+            for i, saved in self._events_saved.items():
+                print(f"🔗 Color {i+1}: {saved} eventos menos al unir tramos")
+            progress_callback(f"Tramos unidos: {sum(self._events_saved.values())} eventos de ratón menos")
+
+    def _compile_label_plan(self, colors, label_map, step_scale=1.0, max_colors=None, progress_callback=None):
+        """Fusiona colores poco rentables y compila y ordena el plan de todas las capas del mapa de etiquetas"""
+        label_map, layers, draw_rank = self._plan_layers(colors, label_map, max_colors, progress_callback)
+
+        # Compilar el plan de trazos de todas las capas antes de dibujar (un grupo por color)
+        self._events_saved = {}
+        plan = concat_plans([self._compile_ranked_layer(colors, label_map, draw_rank, rank, i, step_scale)
+                             for rank, i in enumerate(layers)])
+        self._report_events_saved(progress_callback)
+        return self._schedule_plan(plan, progress_callback)
+
+    def _schedule_plan(self, plan, progress_callback=None):
+        """Ordena un plan completo: unidades (color, pincel) en modo inteligente y trazos de cada capa"""
+        if self.mode == 'smart':
+            # Programar las unidades (color, pincel) para ahorrar cambios de pincel y de color
+            plan, schedule = schedule_units(plan, self._color_switch_cost(), self._brush_switch_cost())
+            if progress_callback:
+                progress_callback(f"Orden de trabajo ({schedule['strategy']}): {schedule['brush_switches']} cambios "
+                                  f"de pincel y {schedule['color_switches']} de color previstos")
+
+        ordered = order_plan(plan, self.stroke_order)
+        if progress_callback:
+            print(f"🧭 Recorrido sin pintar ({self.stroke_order}): "
+                  f"{travel_distance(plan):.0f}px -> {travel_distance(ordered):.0f}px")
+        return ordered
+
+    def _fit_plan_to_deadline(self, colors, label_map, plan, progress_callback, countdown_end=None):
+        """Ajusta colores, paso y trazos para que el dibujo termine dentro del tiempo disponible
+
+        'countdown_end' es cuando acaba la cuenta atrás: lo que quede de ella tampoco es tiempo de dibujo.
+        """
+        def time_left():
+            now = time.monotonic()
+            countdown = max(0.0, countdown_end - now) if countdown_end is not None else 0.0
+            return self.time_budget - (now - self._start_time) - countdown
+
+        remaining = time_left()
+        if self._estimate_plan_seconds(plan) <= remaining:
+            return plan
+
+        progress_callback(f"Ajustando el plan a {remaining:.0f}s disponibles...")
+
+        def compile_candidate(step_scale, max_colors):
+            if step_scale == 1.0 and max_colors is None:
+                return plan
+            return self._compile_label_plan(colors, label_map, step_scale, max_colors)
+
+        plan, summary = fit_plan_to_deadline(time_left, compile_candidate, self.pacing,
+                                             self._color_switch_cost(), self._brush_switch_cost())
+        colors_text = summary['max_colors'] or 'todos los'
+        progress_callback(f"Plan ajustado al tiempo: paso x{summary['step_scale']}, {colors_text} colores"
+                          + (f", {summary['strokes_dropped']} trazos omitidos" if summary['strokes_dropped'] else ""))
+        return plan
+
+    def _stream_plan(self, progress_callback, split=split_by_color):
+        """Prepara el plan en un hilo aparte y entrega sus grupos según están listos -> (colores, capas, *grupo)
+
+        La cuenta atrás inicial transcurre mientras se preprocesa: antes del primer trazo
+        solo se espera lo que quede de ella. El número de capas es el previsto en ese momento:
+        baja si alguna capa se queda sin trazos al compilarla.
+        """
+        countdown_end = time.monotonic() + self.pacing['start_countdown']
+        pipeline = PlanPipeline(lambda emit: self._produce_plan(emit, progress_callback, countdown_end)).start()
+        try:
+            pieces = iter(pipeline)
+            colors = next(pieces)
+            countdown_pending = True
+            for piece in pieces:
+                if countdown_pending:
+                    remaining = countdown_end - time.monotonic()
+                    if remaining > 0:
+                        self.drawing_progress.phase('countdown')
+                        self.input.sleep(remaining)
+                    self.drawing_progress.phase('drawing')
+                    countdown_pending = False
+                for group in split(piece):
+                    yield (colors, self.drawing_progress.layer_total) + tuple(group)
+        finally:
+            pipeline.close()
+
+    def _produce_plan(self, emit, progress_callback, countdown_end=None):
+        """Productor del dibujo: anuncia las capas previstas, emite los colores y después las piezas del plan en orden.
+
+        Con caché o con límite de tiempo el plan completo se conoce antes de dibujar y sale en una sola pieza;
+        si no, cada capa se emite en cuanto se compila.
+        """
+        # El archivo se lee una vez para el hash: lo usan la clave de caché y la imagen preparada
+        image_hash = hash_file(self.image_path)
+        cache_key = self.cache.make_key(self.image_path, self.canvas_region, self.mode, self._cache_params(),
+                                        image_hash=image_hash)
+        cached = self.cache.load(cache_key)
+        if cached is not None:
+            colors = [tuple(int(v) for v in color) for color in cached['colors']]
+            label_map, plan = cached['label_map'], cached['plan']
+            progress_callback("Preprocesado recuperado de la caché")
+        else:
+            colors, label_map = self._preprocess_labels(progress_callback, image_hash)
+            if not self.time_budget:
+                self._stream_layers(emit, cache_key, colors, label_map, progress_callback)
+                return
+            # El ajuste al tiempo necesita el plan entero antes del primer trazo
+            plan = self._compile_label_plan(colors, label_map, progress_callback=progress_callback)
+            self.cache.store(cache_key, colors=np.array(colors, dtype=np.int16),
+                             label_map=label_map, plan=plan)
+
+        if self.time_budget:
+            plan = self._fit_plan_to_deadline(colors, label_map, plan, progress_callback, countdown_end)
+        self._report_plan(plan, progress_callback)
+        self.drawing_progress.layers_planned(len(split_by_color(plan)))
+        emit(colors)
+        emit(plan)
+
+    def _stream_layers(self, emit, cache_key, colors, label_map, progress_callback):
+        """Compila y emite las capas una a una; al terminar guarda en la caché el plan completo.
+
+        Si el dibujo se cancela a mitad, se deja de emitir pero se termina de compilar: así el
+        siguiente intento con la misma imagen y ajustes sale directamente de la caché.
+        """
+        cancelled = False
+
+        def send(piece):
+            nonlocal cancelled
+            if cancelled:
+                return
+            try:
+                emit(piece)
+            except PipelineClosed:
+                cancelled = True
+
+        merged_map, layers, draw_rank = self._plan_layers(colors, label_map, progress_callback=progress_callback)
+        self.drawing_progress.layers_planned(len(layers))
+        send(colors)
+
+        # Área de cada capa: el total del plan se extrapola de las capas ya compiladas hasta tenerlas todas
+        areas = label_counts(merged_map, len(colors))
+        area_total = int(sum(areas[i] for i in layers))
+        area_done = 0
+
+        self._events_saved = {}
+        pieces = []
+        current_brush = None
+        for number, (rank, i) in enumerate(enumerate(layers), start=1):
+            piece = self._compile_ranked_layer(colors, merged_map, draw_rank, rank, i)
+            if self.mode == 'smart':
+                # Sin el plan completo no se puede programar por unidades: se encadenan los pinceles capa a capa
+                piece = chain_units(piece, current_brush)
+            piece = order_plan(piece, self.stroke_order)
+            area_done += int(areas[i])
+            if len(piece):
+                current_brush = int(piece['brush_id'][-1])
+                pieces.append(piece)
+            elif not cancelled:
+                self.drawing_progress.layer_skipped()
+            if pieces and not cancelled and number < len(layers):
+                self._report_partial_plan(pieces, area_done, area_total)
+            if len(piece):
+                send(piece)
+
+        plan = concat_plans(pieces)
+        # Ya con el plan completo se guarda programado: los redibujos desde la caché lo reproducen así
+        self.cache.store(cache_key, colors=np.array(colors, dtype=np.int16), label_map=label_map,
+                         plan=self._schedule_plan(plan))
+        if cancelled:
+            print("💾 Dibujo cancelado: plan completo guardado en la caché para el próximo intento")
+            return
+        self._report_events_saved(progress_callback)
+        self._report_plan(plan, progress_callback)
+
+    def _build_palette_label_map(self, prepared):
+        """Asigna cada píxel visible a su color de la paleta de Gartic con la tabla CIELAB"""
+        image_array = prepared.rgb
+        lut = self._get_palette_lut()
+        if self.dither in ('ordered', 'floyd'):
+            # Se trama a la resolución del pincel para no multiplicar los trazos
+            label_map = dither_to_palette(image_array, list(self.available_colors.values()), lut,
+                                          self.dither, self.brush_step)
+        else:
+            label_map = map_to_palette(image_array, lut).astype(np.int16)
+
+        if prepared.visible is not None:
+            label_map[~prepared.visible] = UNASSIGNED
+        return label_map
+
+    def _preprocess_labels(self, progress_callback, image_hash=None):
+        """Prepara la imagen una vez y la procesa según el modo -> (colores, mapa de etiquetas)"""
+        prepared = self._prepare_image(image_hash)
+        if self.mode == 'palette':
+            return self._preprocess_palette(prepared, progress_callback)
+        return self._preprocess_exact(prepared, progress_callback)
+
+    def _preprocess_palette(self, prepared, progress_callback):
+        """Asigna cada píxel de la imagen preparada a uno de los colores de la paleta"""
+        progress_callback("Asignando píxeles a la paleta de Gartic...")
+        palette_colors = list(self.available_colors.values())
+        label_map = self._build_palette_label_map(prepared)
+        return palette_colors, label_map
+
+    def _preprocess_exact(self, prepared, progress_callback):
+        """Extrae los colores exactos de la imagen preparada y construye el mapa de etiquetas"""
+        progress_callback("Analizando paleta de colores exacta...")
+        exact_colors = self._extract_dominant_colors(prepared, num_colors=50, map_to_palette=False)
+        if not exact_colors:
+            raise Exception("No se pudieron detectar colores en la imagen.")
+        exact_colors = [tuple(int(v) for v in color) for color in exact_colors]
+
+        # Cada píxel visible se asigna una sola vez a su color más cercano,
+        # así las capas no se solapan y no hace falta recordar lo ya dibujado
+        label_map = self._build_label_map(prepared, exact_colors)
+        return exact_colors, label_map
+
     # AÑADE ESTA NUEVA FUNCIÓN
     def _select_brush(self, brush_key):
         """Selecciona un pincel haciendo clic en su coordenada calibrada."""
@@ -168,8 +646,8 @@ class DrawingBot:
 
         try:
             coord = self.brush_coords[brush_key]
-            pyautogui.click(coord)
-            time.sleep(0.1)
+            self.input.click(*coord)
+            self.input.sleep(self.pacing['brush_click'])
             return True
         except Exception as e:
             print(f"Error seleccionando el pincel {brush_key}: {e}")
@@ -183,33 +661,33 @@ class DrawingBot:
 
         try:
             # 1. Abrir el selector de color
-            pyautogui.click(coords['palette_button'])
-            time.sleep(0.1)
+            self.input.click(*coords['palette_button'])
+            self.input.sleep(self.pacing['picker_open'])
 
             # 2. Introducir valor R
-            pyautogui.click(coords['r_field'])
-            time.sleep(0.05)
-            pyautogui.hotkey('ctrl', 'a')
-            pyautogui.press('backspace')
-            pyautogui.typewrite(str(r), interval=0.01)
+            self.input.click(*coords['r_field'])
+            self.input.sleep(self.pacing['picker_field'])
+            self.input.hotkey('ctrl', 'a')
+            self.input.press('backspace')
+            self.input.typewrite(str(r), interval=self.pacing['picker_typing'])
 
             # 3. Introducir valor G
-            pyautogui.click(coords['g_field'])
-            time.sleep(0.05)
-            pyautogui.hotkey('ctrl', 'a')
-            pyautogui.press('backspace')
-            pyautogui.typewrite(str(g), interval=0.01)
+            self.input.click(*coords['g_field'])
+            self.input.sleep(self.pacing['picker_field'])
+            self.input.hotkey('ctrl', 'a')
+            self.input.press('backspace')
+            self.input.typewrite(str(g), interval=self.pacing['picker_typing'])
 
             # 4. Introducir valor B
-            pyautogui.click(coords['b_field'])
-            time.sleep(0.05)
-            pyautogui.hotkey('ctrl', 'a')
-            pyautogui.press('backspace')
-            pyautogui.typewrite(str(b), interval=0.01)
+            self.input.click(*coords['b_field'])
+            self.input.sleep(self.pacing['picker_field'])
+            self.input.hotkey('ctrl', 'a')
+            self.input.press('backspace')
+            self.input.typewrite(str(b), interval=self.pacing['picker_typing'])
 
             # 5. Cerrar el selector (haciendo clic de nuevo en el botón)
-            pyautogui.click(coords['palette_button'])
-            time.sleep(0.15)
+            self.input.click(*coords['palette_button'])
+            self.input.sleep(self.pacing['picker_close'])
             return True
         except Exception as e:
             print(f"Error seleccionando color exacto {rgb_tuple}: {e}")
@@ -229,78 +707,20 @@ class DrawingBot:
         """Verifica controles de pausa y cancelación"""
         if self.cancel_event.is_set():
             if mouse_down:
-                pyautogui.mouseUp()
+                self.input.mouse_up()
             return "cancel"
         
         if self.pause_event.is_set():
             if mouse_down:
-                pyautogui.mouseUp()
+                self.input.mouse_up()
             print("⏸️ Dibujo pausado. Presiona F9 para reanudar.")
             self.pause_event.wait()
             print("▶️ Reanudando dibujo...")
             if mouse_down:
-                pyautogui.mouseDown()
+                self.input.mouse_down()
         
         return "continue"
     
-    def _process_png_with_transparency(self, image_path):
-        """Procesa imágenes PNG manteniendo la transparencia (SIN fondo gris)"""
-        try:
-            # Abrir imagen con PIL
-            pil_image = Image.open(image_path)
-            
-            # Si tiene canal alpha (transparencia)
-            if pil_image.mode in ('RGBA', 'LA'):
-                print("🔍 Detectada imagen con transparencia - manteniendo áreas transparentes")
-                
-                # NO crear fondo - mantener la transparencia
-                # Convertir RGBA a RGB pero manteniendo info de transparencia
-                if pil_image.mode == 'RGBA':
-                    # Crear una versión RGB donde lo transparente queda como "vacío"
-                    rgb_image = Image.new('RGB', pil_image.size, (255, 255, 255))  # Fondo blanco temporal
-                    
-                    # Extraer canal alpha
-                    alpha = pil_image.split()[-1]
-                    
-                    # Combinar solo donde hay contenido visible (alpha > umbral)
-                    rgb_data = pil_image.convert('RGB')
-                    
-                    # Crear máscara de transparencia mejorada
-                    alpha_array = np.array(alpha)
-                    rgb_array = np.array(rgb_data)
-                    
-                    # Marcar píxeles transparentes/semi-transparentes como "sin dibujar"
-                    # Solo consideraremos píxeles con alpha > 200 como sólidos
-                    solid_mask = alpha_array > 200
-                    
-                    # Crear imagen final manteniendo solo píxeles sólidos
-                    final_image = Image.new('RGB', pil_image.size, (255, 255, 255))
-                    final_array = np.array(final_image)
-                    
-                    # Solo copiar píxeles que no son transparentes
-                    final_array[solid_mask] = rgb_array[solid_mask]
-                    
-                    # Crear máscara de áreas a dibujar
-                    self.transparency_mask = solid_mask
-                    
-                    return Image.fromarray(final_array)
-                else:  # LA (grayscale con alpha)
-                    alpha = pil_image.split()[-1]
-                    alpha_array = np.array(alpha)
-                    self.transparency_mask = alpha_array > 200
-                    
-                    rgb_image = pil_image.convert('RGB')
-                    return rgb_image
-            else:
-                # Si no tiene transparencia, usar toda la imagen
-                print("🔍 Imagen sin transparencia - procesando completa")
-                self.transparency_mask = None
-                return pil_image.convert('RGB')
-                
-        except Exception as e:
-            print(f"Error procesando PNG: {e}")
-            return None
-    
     def _enhance_image_quality(self, pil_image):
         """Mejora la calidad de la imagen para mejor reconocimiento de colores"""
         try:
@@ -321,69 +741,49 @@ class DrawingBot:
             print(f"Error mejorando imagen: {e}")
             return pil_image
     
-    def _color_distance(self, color1, color2):
-        """Calcula la distancia entre dos colores usando fórmula más precisa"""
-        # Usar distancia euclidiana ponderada (más precisa para percepción humana)
-        r1, g1, b1 = color1
-        r2, g2, b2 = color2
-        
-        # Pesos basados en percepción visual humana
-        weight_r = 0.3
-        weight_g = 0.59
-        weight_b = 0.11
-        
-        return np.sqrt(weight_r * (r1 - r2)**2 + weight_g * (g1 - g2)**2 + weight_b * (b1 - b2)**2)
-    
+    def _get_palette_lut(self):
+        """Tabla de búsqueda CIELAB (RGB cuantizado -> índice de paleta), construida una vez y guardada en disco"""
+        if getattr(self, '_palette_lut', None) is None:
+            self._palette_keys = list(self.available_colors)
+            self._palette_lut = load_palette_lut(list(self.available_colors.values()))
+        return self._palette_lut
+
     def _find_closest_palette_color(self, target_color):
-        """Encuentra el color más cercano en la paleta disponible"""
-        min_distance = float('inf')
-        closest_color = None
-        
-        for color_key, color_rgb in self.available_colors.items():
-            distance = self._color_distance(target_color, color_rgb)
-            if distance < min_distance:
-                min_distance = distance
-                closest_color = color_key
-        
-        return closest_color
+        """Encuentra el color más cercano en la paleta disponible (distancia perceptual CIELAB)"""
+        lut = self._get_palette_lut()
+        pixel = np.clip(np.asarray(target_color), 0, 255).astype(np.uint8)
+        return self._palette_keys[int(map_to_palette(pixel, lut))]
         
     # REEMPLAZA TU FUNCIÓN _extract_dominant_colors ENTERA CON ESTA:
-    def _extract_dominant_colors(self, image_array, num_colors=10, map_to_palette=True):
+    def _extract_dominant_colors(self, prepared, num_colors=10, map_to_palette=True):
         try:
-            # 1. Preparar los datos de los píxeles
-            if hasattr(self, 'transparency_mask') and self.transparency_mask is not None:
-                # Caso para imágenes con transparencia
-                mask_resized = cv2.resize(self.transparency_mask.astype(np.uint8), 
-                                        (image_array.shape[1], image_array.shape[0]))
-                visible_pixels = image_array[mask_resized > 0]
-                
-                if len(visible_pixels) == 0:
-                    print("⚠️ No hay píxeles visibles en la imagen")
-                    return []
-                
-                data = visible_pixels.reshape((-1, 3))
-            else:
-                # Caso para imágenes sin transparencia
-                data = image_array.reshape((-1, 3))
+            # 1. Preparar los datos de los píxeles (solo los visibles si hay transparencia)
+            data = prepared.visible_pixels()
+            if len(data) == 0:
+                print("⚠️ No hay píxeles visibles en la imagen")
+                return []
 
             # 2. Analizar colores (ESTA PARTE AHORA ESTÁ BIEN INDENTADA)
+            visible_count = len(data)
             non_white_mask = ~((data[:, 0] > 240) & (data[:, 1] > 240) & (data[:, 2] > 240))
             if np.any(non_white_mask):
                 data = data[non_white_mask]
             
             if len(data) == 0: return []
 
-            actual_clusters = min(num_colors, len(np.unique(data, axis=0)))
-            if actual_clusters < 2: return []
-            
-            kmeans = KMeans(n_clusters=actual_clusters, random_state=42, n_init=10)
-            kmeans.fit(data)
+            # Agrupar sobre un histograma cuantizado ponderado: coste acotado sea cual sea la imagen
+            colors, counts = cluster_colors(data, num_colors, refine=self.refine_colors)
+            if len(colors) < 1: return []
             
-            colors = kmeans.cluster_centers_.astype(int)
-            unique_labels, counts = np.unique(kmeans.labels_, return_counts=True)
             color_freq = list(zip(colors, counts))
             color_freq.sort(key=lambda x: x[1], reverse=True)
 
+            # Un color oscuro dominante sobre fondo blanco: dibujo de línea
+            self.line_art_detected = is_line_art(colors, counts, visible_count)
+            if self.line_art_detected:
+                state = "activado" if self._line_art_active() else "sugerido (desactivado)"
+                print(f"✏️ Dibujo de línea detectado: modo línea {state}")
+
             # 3. Devolver el resultado según el modo
             if not map_to_palette:
                 exact_colors = [tuple(c) for c, freq in color_freq]
@@ -402,56 +802,20 @@ class DrawingBot:
             print(f"Error extrayendo colores dominantes: {e}")
             return []
         
-    def _create_color_layers(self, image_array, color_palette):
-        """Crea capas para cada color en la paleta"""
-        layers = {}
-        height, width = image_array.shape[:2]
-        
-        # Aplicar máscara de transparencia si existe
-        drawing_mask = None
-        if hasattr(self, 'transparency_mask') and self.transparency_mask is not None:
-            drawing_mask = cv2.resize(self.transparency_mask.astype(np.uint8), 
-                                    (width, height))
-        
-        for color_key, original_color, freq in color_palette:
-            # Crear máscara para este color
-            layer = np.zeros((height, width), dtype=np.uint8)
-            
-            # Umbral de distancia más estricto para mejor precisión
-            color_threshold = 30  # Reducido para mayor precisión
-            
-            # Para cada pixel, verificar si pertenece a este color
-            for y in range(height):
-                for x in range(width):
-                    # Verificar si el píxel debe dibujarse (no transparente)
-                    if drawing_mask is not None and drawing_mask[y, x] == 0:
-                        continue
-                    
-                    pixel_color = tuple(image_array[y, x])
-                    
-                    # Calcular distancia directa al color original detectado
-                    distance = self._color_distance(pixel_color, original_color)
-                    
-                    if distance < color_threshold:
-                        layer[y, x] = 255
-            
-            # Solo agregar capas que tienen contenido
-            if np.any(layer == 255):
-                layers[color_key] = layer
-                pixel_count = np.sum(layer == 255)
-                print(f"📝 Capa {self._get_color_name(color_key)}: {pixel_count} píxeles")
-            else:
-                print(f"⚠️ Capa {self._get_color_name(color_key)}: vacía, omitiendo")
-        
-        return layers
-    
+    def _build_label_map(self, prepared, colors):
+        """Asigna cada píxel visible a su color más cercano; el blanco cuenta como fondo sin dibujar"""
+        return build_label_map(prepared.rgb, colors,
+                               visible_mask=prepared.visible,
+                               max_distance=self.label_max_distance,
+                               background=(255, 255, 255))
+
     def _select_color(self, color_key):
         """Selecciona un color en la paleta de Gartic Phone"""
         try:
             if color_key in self.palette_data:
                 coord = self.palette_data[color_key]
-                pyautogui.click(coord[0], coord[1])
-                time.sleep(0.15)  # Pausa ligeramente mayor para asegurar selección
+                self.input.click(coord[0], coord[1])
+                self.input.sleep(self.pacing['palette_click'])  # Pausa ligeramente mayor para asegurar selección
                 return True
             else:
                 print(f"⚠️ Color {color_key} no encontrado en paleta calibrada")
@@ -460,71 +824,80 @@ class DrawingBot:
             print(f"Error seleccionando color {color_key}: {e}")
             return False
         
-    # REEMPLAZA LA FUNCIÓN ENTERA
-    def _draw_layer_optimized(self, layer, color_key, progress_callback=None):
-        """Dibuja una capa con algoritmo optimizado, saltando líneas según el pincel."""
-        if color_key != "exact_mode":
-            if not self._select_color(color_key):
-                return
-
+    def _execute_plan(self, plan):
+        """Reproduce un plan de trazos ya compilado. Devuelve False si se canceló."""
         canvas_x_start, canvas_y_start = self.canvas_region[0], self.canvas_region[1]
-        height, width = layer.shape
-
-        # Bucle 'while' para permitir saltos de 'y'
-        y = 0
-        while y < height:
-            if self._check_controls() == "cancel":
-                return
-
-            x = 0
-            while x < width:
-                # Buscar inicio de línea
-                if layer[y, x] == 255:
-                    start_x = x
-                    # Buscar final de línea
-                    while x < width and layer[y, x] == 255:
-                        x += 1
-                    end_x = x - 1
-
-                    # Dibujar la línea
-                    screen_start_x = canvas_x_start + start_x
-                    screen_start_y = canvas_y_start + y
-                    screen_end_x = canvas_x_start + end_x
-
-                    pyautogui.moveTo(screen_start_x, screen_start_y, duration=0)
-                    time.sleep(0.02)
-                    pyautogui.mouseDown()
-                    if end_x > start_x:
-                        pyautogui.moveTo(screen_end_x, screen_start_y, duration=0.01)
-                    pyautogui.mouseUp()
-                    time.sleep(0.03)
-                else:
-                    x += 1
-
-            # ¡EL GRAN CAMBIO! Saltamos píxeles en el eje Y
-            y += self.brush_step
+        delay_before, delay_after = self.pacing['stroke_before'], self.pacing['stroke_after']
+        drag_duration = self.pacing['stroke_drag']
+
+        # Los segmentos encadenados siguen arrastrando sin soltar el ratón
+        pen_at = None
+        for y, start_x, end_x, end_y, joined in zip(plan['y'].tolist(), plan['x_start'].tolist(),
+                                                    plan['x_end'].tolist(), plan['y_end'].tolist(),
+                                                    plan['joined'].tolist()):
+            # Eventos de ratón del trazo: mover + pulsar + soltar si empieza pulsación, más el arrastre
+            events = 0
+            if not (joined and pen_at == (start_x, y)):
+                events = 3
+                if pen_at is not None:
+                    self.input.mouse_up()
+                    self.input.sleep(delay_after)
+                    pen_at = None
+                if self._check_controls() == "cancel":
+                    return False
+
+                self.input.move_to(canvas_x_start + start_x, canvas_y_start + y, duration=0)
+                self.input.sleep(delay_before)
+                self.input.mouse_down()
+            if end_x != start_x or end_y != y:
+                self.input.move_to(canvas_x_start + end_x, canvas_y_start + end_y, duration=drag_duration)
+                events += 1
+            pen_at = (end_x, end_y)
+            self.drawing_progress.advance(1, events)
+
+        if pen_at is not None:
+            self.input.mouse_up()
+            self.input.sleep(delay_after)
+        return True
                 
     def draw_by_layers(self, progress_callback=None):
         """Método principal que elige el flujo de dibujo según el modo."""
+        # El presupuesto de tiempo cuenta desde que empieza el dibujo
+        self._start_time = time.monotonic()
+        self.drawing_progress = DrawingProgress(self.progress_event_callback)
+        self.drawing_progress.phase('preprocess')
         if self.mode == 'smart': # <-- AÑADE ESTE ELIF
             self.draw_by_smart_mode(progress_callback)
         elif self.mode == 'exact':
             self.draw_by_exact_colors(progress_callback)
         else: # modo 'palette'
             self.draw_by_palette_colors(progress_callback)
+        self.drawing_progress.phase('cancelled' if self.cancel_event.is_set() else 'done')
 
-    # EN drawing_bot.py, ASEGÚRATE DE TENER ESTA FUNCIÓN
     def draw_by_palette_colors(self, progress_callback=None):
-        """Método de dibujo por paleta (tu función original renombrada)."""
-        #
-        # AQUÍ VA TODO EL CÓDIGO de tu función de dibujo original
-        # que usaba la paleta de 18 colores para crear y dibujar las capas.
-        #
+        """Dibuja con los 18 colores de la paleta de Gartic: un solo clic por color usado."""
         try:
             progress_callback("Iniciando dibujo en MODO PALETA...")
-            time.sleep(3)
-            # ...el resto de tu código de dibujo por paleta...
-            
+
+            # Cada píxel se asigna a su color de paleta; una capa por color realmente usado,
+            # que se dibuja en cuanto está compilada
+            palette_keys = list(self.available_colors)
+            groups = self._stream_plan(progress_callback)
+            for n, (_, layer_count, i, strokes) in enumerate(groups):
+                if self._check_controls() == "cancel": break
+                color_key = palette_keys[i]
+
+                progress_callback(f"Dibujando {self._get_color_name(color_key)} ({n+1}/{layer_count})")
+                self.drawing_progress.layer(n + 1, layer_count)
+
+                if not self._select_color(color_key):
+                    self.drawing_progress.advance(len(strokes), 0)
+                    continue
+                self.drawing_progress.switched(color=True)
+                if not self._execute_plan(strokes): break
+
+            progress_callback("¡Dibujo por paleta completado!")
+
         except Exception as e:
             error_msg = f"Error durante el dibujo por paleta: {str(e)}"
             print(f"❌ {error_msg}")
@@ -535,74 +908,24 @@ class DrawingBot:
         """Dibuja usando colores exactos de forma eficiente, evitando repintar."""
         try:
             progress_callback("Iniciando dibujo en MODO PRECISO...")
-            time.sleep(3)
-
-            # Paso 1: Procesar imagen (sin cambios)
-            if self.image_path.lower().endswith('.png'):
-                pil_image = self._process_png_with_transparency(self.image_path)
-            else:
-                pil_image = Image.open(self.image_path).convert('RGB')
-            pil_image = self._enhance_image_quality(pil_image)
-            canvas_w, canvas_h = self.canvas_region[2], self.canvas_region[3]
-            pil_image.thumbnail((canvas_w, canvas_h), Image.Resampling.LANCZOS)
-            image_array = np.array(pil_image)
-            height, width = image_array.shape[:2]
-
-            # --- INICIO DE CAMBIOS IMPORTANTES ---
 
-            # NUEVO: Crear un "mapa" para recordar los píxeles ya dibujados.
-            drawn_mask = np.zeros((height, width), dtype=np.uint8)
-
-            # --- FIN DE CAMBIOS IMPORTANTES ---
-
-            # Paso 2: Extraer colores exactos (sin cambios)
-            progress_callback("Analizando paleta de colores exacta...")
-            exact_colors = self._extract_dominant_colors(image_array, num_colors=50, map_to_palette=False)
-            if not exact_colors:
-                raise Exception("No se pudieron detectar colores en la imagen.")
-
-            # Paso 3: Dibujar cada capa de color, pero solo en áreas no pintadas
-            total_colors = len(exact_colors)
-            for i, color in enumerate(exact_colors):
+            # Pasos 1-3: Procesar imagen, extraer colores y compilar el plan (o recuperarlo de la caché)
+            # en un hilo aparte; paso 4: reproducir cada color en cuanto su capa está lista
+            groups = self._stream_plan(progress_callback)
+            for n, (exact_colors, layer_count, i, strokes) in enumerate(groups):
                 if self._check_controls() == "cancel": break
-                
-                # El blanco puro suele ser el fondo, lo omitimos para acelerar
-                if color[0] > 240 and color[1] > 240 and color[2] > 240:
-                    continue
+                color = exact_colors[i]
 
-                progress_callback(f"Procesando color {i+1}/{total_colors}: RGB{color}")
-
-                # Crear la capa de forma flexible (sin cambios)
-                layer = np.zeros((height, width), dtype=np.uint8)
-                color_threshold = 25
-                for y in range(height):
-                    for x in range(width):
-                        pixel_color = tuple(image_array[y, x])
-                        distance = self._color_distance(pixel_color, color)
-                        if distance < color_threshold:
-                            layer[y, x] = 255
+                progress_callback(f"Dibujando color {i+1}/{len(exact_colors)}: RGB{color}")
+                self.drawing_progress.layer(n + 1, layer_count)
                 
-                # --- INICIO DE CAMBIOS IMPORTANTES ---
-
-                # NUEVO: Antes de dibujar, eliminamos de la capa actual los píxeles
-                # que ya han sido pintados por un color anterior.
-                layer[drawn_mask == 255] = 0
-
-                # Si todavía quedan píxeles por dibujar en esta capa...
-                if np.any(layer):
-                    progress_callback(f"Dibujando color {i+1}/{total_colors}: RGB{color}")
-                    
-                    if not self._select_exact_color(color):
-                        print(f"⚠️ Omitiendo color {color} por error en la selección.")
-                        continue
-
-                    self._draw_layer_optimized(layer, color_key="exact_mode", progress_callback=progress_callback)
-
-                    # NUEVO: Actualizamos nuestro mapa de memoria, marcando las nuevas
-                    # áreas como ya dibujadas.
-                    drawn_mask[layer == 255] = 255
+                if not self._select_exact_color(color):
+                    print(f"⚠️ Omitiendo color {color} por error en la selección.")
+                    self.drawing_progress.advance(len(strokes), 0)
+                    continue
+                self.drawing_progress.switched(color=True)
 
-                # --- FIN DE CAMBIOS IMPORTANTES ---
+                if not self._execute_plan(strokes): break
                 
             progress_callback("¡Dibujo de alta precisión completado!")
 
@@ -615,6 +938,22 @@ class DrawingBot:
     def _get_color_name(self, color_key):
         """Obtiene el nombre amigable del color"""
         color_names = {
+            '102,102,102': 'Gris medio oscuro',
+            '0,80,205': 'Azul intenso',
+            '170,170,170': 'Gris claro',
+            '38,201,255': 'Cian brillante',
+            '1,116,32': 'Verde oscuro',
+            '153,0,0': 'Rojo oscuro',
+            '150,65,18': 'Marrón rojizo',
+            '17,176,60': 'Verde brillante',
+            '255,0,19': 'Rojo brillante',
+            '255,120,41': 'Naranja fuerte',
+            '176,112,28': 'Marrón mostaza',
+            '153,0,78': 'Fucsia oscuro',
+            '203,90,87': 'Rojo salmón oscuro',
+            '255,193,38': 'Amarillo dorado',
+            '255,0,143': 'Rosa fuerte',
+            '254,175,168': 'Rosa claro',
             '0,0,0': 'Negro',
             '89,89,89': 'Gris oscuro', 
             '0,85,255': 'Azul',
@@ -0,0 +1,85 @@
+import numpy as np
+from PIL import Image
+from bot.preprocess_cache import hash_file
+
+# Alfa mínimo (0-255) para considerar un píxel sólido; el resto no se dibuja
+SOLID_ALPHA = 200
+
+# La decodificación reducida deja al menos este margen sobre el tamaño final para el remuestreo LANCZOS
+REDUCING_GAP = 2.0
+
+
+def fit_size(size, box):
+    """Tamaño (ancho, alto) de una imagen ajustada dentro de 'box' conservando la proporción, sin ampliarla"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def open_at_size(path, box):
+    """Abre la imagen decodificándola ya cerca del tamaño final y la ajusta a 'box' -> (imagen PIL RGB o RGBA, escala)"""
+    image = Image.open(path)
+    target = fit_size(image.size, box)
+    scale = target[0] / image.size[0]
+
+    # JPEG: el decodificador escala la DCT (1/2, 1/4, 1/8) y nunca llega a leer la resolución completa
+    image.draft(None, (int(target[0] * REDUCING_GAP), int(target[1] * REDUCING_GAP)))
+
+    if image.mode not in ('RGB', 'RGBA'):
+        # Paletas con transparencia y gris con alfa conservan el canal alfa
+        has_alpha = image.mode in ('LA', 'PA', 'La') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    # Image.reduce por un factor entero y LANCZOS solo para el último tramo
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    return image, scale
+
+
+def split_alpha(image):
+    """Separa la imagen en (array RGB, máscara de píxeles sólidos o None); lo transparente queda en blanco"""
+    array = np.array(image)
+    if image.mode != 'RGBA':
+        return array, None
+
+    solid = array[..., 3] > SOLID_ALPHA
+    rgb = array[..., :3]
+    rgb[~solid] = 255
+    return np.ascontiguousarray(rgb), solid
+
+
+class PreparedImage:
+    """Imagen lista para el preprocesado: se prepara una vez por dibujo y pasa por todas las etapas.
+
+    rgb: array uint8 (alto, ancho, 3) al tamaño del canvas, con lo transparente en blanco.
+    visible: máscara bool (alto, ancho) de los píxeles que se dibujan, o None si la imagen es opaca.
+    scale: factor aplicado a la imagen original para ajustarla al canvas.
+    content_hash: SHA-256 del archivo de origen.
+    """
+
+    def __init__(self, rgb, visible, scale, content_hash):
+        self.rgb = rgb
+        self.visible = visible
+        self.scale = scale
+        self.content_hash = content_hash
+
+    @property
+    def shape(self):
+        """(alto, ancho) de la imagen preparada"""
+        return self.rgb.shape[:2]
+
+    def visible_pixels(self):
+        """Píxeles visibles como array (N, 3)"""
+        if self.visible is None:
+            return self.rgb.reshape(-1, 3)
+        return self.rgb[self.visible]
+
+
+def prepare_image(path, box, enhance=None, content_hash=None):
+    """Carga la imagen al tamaño de 'box', separa la transparencia y aplica 'enhance' (PIL -> PIL) -> PreparedImage"""
+    image, scale = open_at_size(path, box)
+    rgb, visible = split_alpha(image)
+    if enhance is not None:
+        # La mejora trabaja ya sobre la imagen reducida
+        rgb = np.asarray(enhance(Image.fromarray(rgb)), dtype=np.uint8)
+    return PreparedImage(np.ascontiguousarray(rgb), visible, scale, content_hash or hash_file(path))
@@ -0,0 +1,106 @@
+import time
+from collections import Counter
+import numpy as np
+
+
+class PyAutoGUIBackend:
+    """Envía eventos reales de ratón y teclado usando pyautogui (backend por defecto)"""
+
+    def __init__(self):
+        # Se importa aquí porque pyautogui necesita un escritorio al importarse
+        import pyautogui
+        self._pyautogui = pyautogui
+
+        # Configuración de pyautogui
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0
+
+    def move_to(self, x, y, duration=0):
+        self._pyautogui.moveTo(x, y, duration=duration)
+
+    def mouse_down(self):
+        self._pyautogui.mouseDown()
+
+    def mouse_up(self):
+        self._pyautogui.mouseUp()
+
+    def click(self, x, y):
+        self._pyautogui.click(x, y)
+
+    def hotkey(self, *keys):
+        self._pyautogui.hotkey(*keys)
+
+    def press(self, key):
+        self._pyautogui.press(key)
+
+    def typewrite(self, text, interval=0):
+        self._pyautogui.typewrite(text, interval=interval)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def screenshot(self, region):
+        """Captura la región (x, y, ancho, alto) de la pantalla como array RGB"""
+        return np.array(self._pyautogui.screenshot(region=tuple(region)).convert('RGB'))
+
+
+class NullBackend:
+    """No envía nada: solo cuenta los eventos y acumula el tiempo que habrían esperado"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.simulated_time = 0.0
+
+    def _record(self, name, *args):
+        self.counts[name] += 1
+
+    def move_to(self, x, y, duration=0):
+        self.simulated_time += duration
+        self._record('move_to', x, y, duration)
+
+    def mouse_down(self):
+        self._record('mouse_down')
+
+    def mouse_up(self):
+        self._record('mouse_up')
+
+    def click(self, x, y):
+        self._record('click', x, y)
+
+    def hotkey(self, *keys):
+        self._record('hotkey', *keys)
+
+    def press(self, key):
+        self._record('press', key)
+
+    def typewrite(self, text, interval=0):
+        self.simulated_time += len(text) * interval
+        self._record('typewrite', text, interval)
+
+    def sleep(self, seconds):
+        # Las pausas no bloquean: solo avanzan el reloj simulado
+        self.simulated_time += seconds
+        self.counts['sleep'] += 1
+
+    def screenshot(self, region):
+        # Sin escritorio no hay nada que capturar
+        return None
+
+    @property
+    def total_events(self):
+        """Número de eventos de entrada emitidos (sin contar las pausas)"""
+        return sum(count for name, count in self.counts.items() if name != 'sleep')
+
+
+class RecordingBackend(NullBackend):
+    """Registra cada evento con su marca de tiempo (tiempo real + tiempo simulado de las pausas)"""
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self._start = time.perf_counter()
+
+    def _record(self, name, *args):
+        super()._record(name, *args)
+        timestamp = time.perf_counter() - self._start + self.simulated_time
+        self.events.append((timestamp, name, args))
@@ -0,0 +1,80 @@
+import numpy as np
+from bot.parallel_bands import map_row_bands, use_parallel
+
+# Pesos por canal (R, G, B) basados en la percepción visual humana
+COLOR_WEIGHTS = (0.3, 0.59, 0.11)
+
+# Filas procesadas por bloque: acota la memoria temporal a filas x ancho x colores
+ROWS_PER_CHUNK = 32
+
+
+def weighted_distances(pixels, colors):
+    """Calcula la distancia ponderada de cada píxel (N, 3) a cada color (K, 3) -> (N, K)"""
+    pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 3)
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+
+    # Se acumula canal por canal para no crear un temporal (N, K, 3)
+    total = np.zeros((pixels.shape[0], colors.shape[0]), dtype=np.float64)
+    for channel, weight in enumerate(COLOR_WEIGHTS):
+        diff = pixels[:, channel, None] - colors[None, :, channel]
+        total += weight * diff * diff
+
+    return np.sqrt(total, out=total)
+
+
+# Etiqueta de los píxeles que no pertenecen a ninguna capa (transparentes, fondo o lejanos)
+UNASSIGNED = -1
+
+
+def build_label_map(image_array, colors, visible_mask=None, max_distance=None, background=None,
+                    rows_per_chunk=ROWS_PER_CHUNK, parallel=True):
+    """Asigna cada píxel visible a su color más cercano en una sola pasada -> mapa int16 (alto, ancho)
+
+    En imágenes grandes las filas se reparten en bandas entre varios procesos (ver bot.parallel_bands).
+    """
+    height, width = image_array.shape[:2]
+    if parallel and len(colors) and use_parallel(height * width):
+        return map_row_bands(build_label_map, {'image_array': image_array, 'visible_mask': visible_mask}, np.int16,
+                             colors=colors, max_distance=max_distance, background=background,
+                             rows_per_chunk=rows_per_chunk, parallel=False)
+    label_map = np.full((height, width), UNASSIGNED, dtype=np.int16)
+    if len(colors) == 0:
+        return label_map
+
+    # El fondo compite como un color más, pero sus píxeles quedan sin asignar
+    candidates = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    if background is not None:
+        candidates = np.vstack([candidates, np.asarray(background, dtype=np.float64)])
+    num_colors = len(colors)
+
+    for y0 in range(0, height, rows_per_chunk):
+        y1 = min(y0 + rows_per_chunk, height)
+        block = image_array[y0:y1, :, :3].reshape(-1, 3)
+
+        distances = weighted_distances(block, candidates)
+        labels = np.argmin(distances, axis=1).astype(np.int16)
+        labels[labels >= num_colors] = UNASSIGNED
+
+        # Regla opcional: "sin asignar si está más lejos que max_distance"
+        if max_distance is not None:
+            nearest = distances[np.arange(len(labels)), np.maximum(labels, 0)]
+            labels[nearest >= max_distance] = UNASSIGNED
+
+        labels = labels.reshape(y1 - y0, width)
+        if visible_mask is not None:
+            labels[visible_mask[y0:y1, :] == 0] = UNASSIGNED
+
+        label_map[y0:y1, :] = labels
+
+    return label_map
+
+
+def label_counts(label_map, num_colors):
+    """Cuenta los píxeles asignados a cada color del mapa de etiquetas"""
+    assigned = label_map[label_map != UNASSIGNED]
+    return np.bincount(assigned.ravel(), minlength=num_colors)[:num_colors]
+
+
+def layer_from_labels(label_map, index):
+    """Deriva la capa (255 = dibujar) de un color a partir del mapa de etiquetas"""
+    return (label_map == index).astype(np.uint8) * 255
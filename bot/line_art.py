@@ -0,0 +1,142 @@
+import numpy as np
+import cv2
+
+# Una imagen es de línea si la tinta (grises oscuros) reúne casi todo lo que no es blanco
+# y ese "no blanco" ocupa poca superficie
+LINE_ART_MAX_LUMA = 100
+LINE_ART_MIN_SHARE = 0.7
+LINE_ART_MAX_COVERAGE = 0.35
+# Diferencia máxima entre canales de un gris; los grises claros son el borde suavizado de las líneas
+NEUTRAL_MAX_CHROMA = 40
+
+# Tolerancia (px) al simplificar las polilíneas del esqueleto
+SKELETON_TOLERANCE = 1.0
+
+# Vecinos en el orden de Zhang-Suen (P2..P9, en sentido horario empezando arriba)
+_NEIGHBOURS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+# Al seguir el esqueleto se prefieren los vecinos en cruz antes que los diagonales
+_WALK_OFFSETS = ((-1, 0), (0, 1), (1, 0), (0, -1), (-1, 1), (1, 1), (1, -1), (-1, -1))
+
+
+def luma(color):
+    """Luminancia aproximada (0-255) de un color RGB"""
+    return 0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]
+
+
+def is_line_art(colors, counts, visible_pixels):
+    """Indica si los colores extraídos (sin el blanco) corresponden a un dibujo de línea oscura sobre blanco
+
+    La tinta se suma entre todos los grupos gris oscuro, y los grises claros del suavizado no cuentan
+    en su contra: al reducir la imagen los bordes de las líneas se reparten en muchos grupos.
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    if len(colors) == 0 or visible_pixels == 0 or counts.sum() == 0:
+        return False
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    lumas = colors @ np.array([0.299, 0.587, 0.114])
+    neutral = np.ptp(colors, axis=1) < NEUTRAL_MAX_CHROMA
+    ink = counts[neutral & (lumas < LINE_ART_MAX_LUMA)].sum()
+    halo = counts[neutral & (lumas >= LINE_ART_MAX_LUMA)].sum()
+    drawn = counts.sum() - halo
+    coverage = counts.sum() / visible_pixels
+    return drawn > 0 and ink / drawn >= LINE_ART_MIN_SHARE and coverage <= LINE_ART_MAX_COVERAGE
+
+
+def thin(mask):
+    """Adelgaza la máscara a un esqueleto de un píxel (Zhang-Suen, cada pasada vectorizada)"""
+    image = np.pad((np.asarray(mask) > 0).astype(np.uint8), 1)
+    height, width = image.shape
+
+    while True:
+        changed = False
+        for sub_iteration in (0, 1):
+            p = [image[1 + dy:height - 1 + dy, 1 + dx:width - 1 + dx] for dy, dx in _NEIGHBOURS]
+            neighbours = sum(p)
+            transitions = sum((p[i] == 0) & (p[(i + 1) % 8] == 1) for i in range(8))
+            if sub_iteration == 0:
+                side = (p[0] * p[2] * p[4] == 0) & (p[2] * p[4] * p[6] == 0)
+            else:
+                side = (p[0] * p[2] * p[6] == 0) & (p[0] * p[4] * p[6] == 0)
+
+            core = image[1:-1, 1:-1]
+            delete = (core == 1) & (neighbours >= 2) & (neighbours <= 6) & (transitions == 1) & side
+            if delete.any():
+                core[delete] = 0
+                changed = True
+        if not changed:
+            break
+
+    return image[1:-1, 1:-1]
+
+
+def trace_skeleton(skeleton):
+    """Recorre el esqueleto en polilíneas conexas -> [array (N, 2) de (x, y)]
+
+    Se empieza por los extremos (un solo vecino) para que cada trazo abierto salga entero;
+    al llegar a un cruce ya recorrido se enlaza con él para no dejar huecos.
+    """
+    image = np.pad((np.asarray(skeleton) > 0).astype(np.uint8), 1)
+    neighbour_count = cv2.filter2D(image, -1, np.ones((3, 3), np.float32), borderType=cv2.BORDER_CONSTANT) - image
+    visited = image == 0
+
+    ys, xs = np.nonzero(image)
+    order = np.argsort(neighbour_count[ys, xs] != 1, kind='stable')
+    starts = list(zip(ys[order].tolist(), xs[order].tolist()))
+
+    polylines = []
+    for start in starts:
+        if visited[start]:
+            continue
+        y, x = start
+        visited[y, x] = True
+        path = [(x, y)]
+        # Si el inicio toca un tramo ya dibujado, se arranca desde él
+        for dy, dx in _WALK_OFFSETS:
+            if image[y + dy, x + dx] and visited[y + dy, x + dx]:
+                path.insert(0, (x + dx, y + dy))
+                break
+
+        while True:
+            for dy, dx in _WALK_OFFSETS:
+                if not visited[y + dy, x + dx]:
+                    y, x = y + dy, x + dx
+                    visited[y, x] = True
+                    path.append((x, y))
+                    break
+            else:
+                # Final del tramo: enlazar con un píxel ya recorrido vecino (un cruce) si lo hay
+                recent = path[-3:]
+                for dy, dx in _WALK_OFFSETS:
+                    if image[y + dy, x + dx] and (x + dx, y + dy) not in recent:
+                        path.append((x + dx, y + dy))
+                        break
+                break
+
+        # Quitar el borde añadido
+        polylines.append(np.array(path, dtype=np.int32) - 1)
+    return polylines
+
+
+def split_thin_thick(layer, max_width):
+    """Separa la capa en trazos finos (hasta 'max_width' px de ancho) y zonas gruesas -> (finos, gruesos)
+
+    Las zonas gruesas son donde cabe un disco más ancho que 'max_width' (apertura morfológica);
+    esas se rellenan por barrido y solo lo fino se reduce a su esqueleto.
+    """
+    mask = (np.asarray(layer) > 0).astype(np.uint8)
+    size = int(max_width) + 1
+    disk = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+    thick = cv2.morphologyEx(mask, cv2.MORPH_OPEN, disk, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    # El borde de un píxel que la apertura deja alrededor de lo grueso ya lo cubre el relleno
+    covered = cv2.dilate(thick, np.ones((3, 3), np.uint8))
+    return (mask & (1 - covered)) * 255, thick * 255
+
+
+def skeleton_polylines(layer, tolerance=SKELETON_TOLERANCE):
+    """Esqueleto de la capa convertido en polilíneas simplificadas"""
+    polylines = []
+    for path in trace_skeleton(thin(layer)):
+        if len(path) > 2:
+            path = cv2.approxPolyDP(path.reshape(-1, 1, 2), tolerance, False).reshape(-1, 2)
+        polylines.append(path)
+    return polylines
@@ -0,0 +1,141 @@
+import json
+import os
+import numpy as np
+
+PACING_FILE = os.path.join('assets', 'pacing_profiles.json')
+
+# Perfil 'normal': las pausas (segundos) que usaba el bot originalmente
+DEFAULT_PACING = {
+    'start_countdown': 3.0,   # Cuenta atrás antes de empezar a dibujar
+    'stroke_before': 0.02,    # Tras mover el cursor al inicio del trazo
+    'stroke_after': 0.03,     # Tras soltar el botón al final del trazo
+    'stroke_drag': 0.01,      # Duración del arrastre de cada trazo
+    'palette_click': 0.15,    # Tras elegir un color de la paleta
+    'brush_click': 0.1,       # Tras elegir un pincel
+    'picker_open': 0.1,       # Tras abrir el selector de color exacto
+    'picker_field': 0.05,     # Tras hacer clic en un campo R/G/B
+    'picker_typing': 0.01,    # Intervalo entre teclas al escribir un valor
+    'picker_close': 0.15,     # Tras cerrar el selector de color exacto
+}
+
+PROFILE_NAMES = ('safe', 'normal', 'aggressive', 'custom')
+
+# Factores probados por la calibración, del más rápido al más lento
+CALIBRATION_FACTORS = (0.2, 0.35, 0.5, 0.75, 1.0)
+
+# Pausas de los trazos: las únicas que mide la calibración
+STROKE_KEYS = ('stroke_before', 'stroke_after', 'stroke_drag')
+
+
+def scale_pacing(pacing, factor, keys=None):
+    """Escala las pausas de un perfil, o solo las de 'keys' (la cuenta atrás no se toca)"""
+    scaled = {key: round(value * factor, 4) if keys is None or key in keys else value
+              for key, value in pacing.items()}
+    scaled['start_countdown'] = pacing['start_countdown']
+    return scaled
+
+
+def default_profiles():
+    """Perfiles predefinidos derivados del perfil normal"""
+    return {
+        'safe': scale_pacing(DEFAULT_PACING, 2.0),
+        'normal': dict(DEFAULT_PACING),
+        'aggressive': scale_pacing(DEFAULT_PACING, 0.4),
+        'custom': dict(DEFAULT_PACING),
+    }
+
+
+def load_pacing_profiles(path=PACING_FILE):
+    """Carga los perfiles de ritmo; los que falten se completan con los valores por defecto"""
+    profiles = default_profiles()
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f).get('profiles', {})
+            for name, values in stored.items():
+                profiles[name] = {**DEFAULT_PACING, **values}
+        except Exception as e:
+            print(f"⚠️ Error cargando perfiles de ritmo, usando valores por defecto: {e}")
+    return profiles
+
+
+def get_pacing(profile='normal', path=PACING_FILE):
+    """Devuelve las pausas de un perfil por nombre, o completa un diccionario de pausas ya dado"""
+    if isinstance(profile, dict):
+        return {**DEFAULT_PACING, **profile}
+    profiles = load_pacing_profiles(path)
+    if profile not in profiles:
+        print(f"⚠️ Perfil de ritmo '{profile}' desconocido. Usando 'normal'.")
+        profile = 'normal'
+    return profiles[profile]
+
+
+def save_custom_profile(pacing, path=PACING_FILE):
+    """Guarda unas pausas como perfil 'custom'"""
+    profiles = load_pacing_profiles(path)
+    profiles['custom'] = {**DEFAULT_PACING, **pacing}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'profiles': profiles}, f, indent=4)
+
+
+def _draw_test_strokes(input_backend, pacing, origin_x, rows, length):
+    """Dibuja trazos horizontales de prueba con las pausas dadas"""
+    for y in rows:
+        input_backend.move_to(origin_x, y, duration=0)
+        input_backend.sleep(pacing['stroke_before'])
+        input_backend.mouse_down()
+        input_backend.move_to(origin_x + length, y, duration=pacing['stroke_drag'])
+        input_backend.mouse_up()
+        input_backend.sleep(pacing['stroke_after'])
+
+
+def _strokes_visible(before, after, rows, origin_x, length, min_changed=0.8):
+    """Comprueba en las capturas que cada trazo de prueba ha cambiado la mayoría de sus píxeles"""
+    for y in rows:
+        line_before = before[y, origin_x:origin_x + length]
+        line_after = after[y, origin_x:origin_x + length]
+        changed = np.any(np.abs(line_after.astype(np.int16) - line_before) > 30, axis=-1)
+        if np.mean(changed) < min_changed:
+            return False
+    return True
+
+
+def calibrate_pacing(input_backend, canvas_region, strokes=8, length=40, progress_callback=None):
+    """Busca las pausas más rápidas con las que todos los trazos de prueba aparecen en el canvas.
+
+    Dibuja trazos cortos en la parte inferior izquierda del canvas con cada factor de
+    CALIBRATION_FACTORS y se queda con el más rápido que los dibuja todos dos veces seguidas.
+    Cada factor usa su propia zona para no confundirse con los trazos de intentos anteriores.
+    Solo se prueban trazos: las pausas de selección de color y de pincel se quedan en las del perfil normal.
+    """
+    x0, y0, width, height = canvas_region
+    band_height = strokes * 4 * 2
+    if width < len(CALIBRATION_FACTORS) * (length + 10) + 10 or height < band_height + 20:
+        raise Exception("El canvas es demasiado pequeño para calibrar el ritmo.")
+
+    for index, factor in enumerate(CALIBRATION_FACTORS):
+        pacing = scale_pacing(DEFAULT_PACING, factor, STROKE_KEYS)
+        region = (x0 + 10 + index * (length + 10), y0 + height - band_height - 10, length + 10, band_height)
+        if progress_callback:
+            progress_callback(f"Calibrando ritmo x{factor}...")
+
+        stable = True
+        for attempt in range(2):
+            # Cada intento usa su propia franja de filas para no confundirse con el anterior
+            rows = [attempt * strokes * 4 + 2 + i * 4 for i in range(strokes)]
+            before = input_backend.screenshot(region)
+            _draw_test_strokes(input_backend, pacing, region[0] + 5,
+                               [region[1] + y for y in rows], length - 5)
+            input_backend.sleep(0.3)
+            after = input_backend.screenshot(region)
+            if before is None or after is None:
+                raise Exception("El backend de entrada no puede capturar la pantalla.")
+            if not _strokes_visible(before, after, rows, 5, length - 5):
+                stable = False
+                break
+
+        if stable:
+            return pacing
+
+    return dict(DEFAULT_PACING)
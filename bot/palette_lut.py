@@ -0,0 +1,79 @@
+import os
+import numpy as np
+
+PALETTE_LUT_FILE = os.path.join('assets', 'palette_lut.npz')
+
+# Bits por canal del cubo RGB cuantizado: 6 bits -> 64^3 entradas
+LUT_BITS = 6
+
+# Punto blanco D65 para la conversión XYZ -> CIELAB
+_WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+
+
+def rgb_to_lab(rgb):
+    """Convierte colores sRGB (..., 3) en 0-255 a CIELAB (D65)"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE_D65
+
+    epsilon, kappa = 216 / 24389, 24389 / 27
+    f = np.where(xyz > epsilon, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def build_palette_lut(palette_rgb, bits=LUT_BITS):
+    """Calcula, para cada celda del cubo RGB cuantizado, el índice del color de paleta más cercano (deltaE)"""
+    palette_lab = rgb_to_lab(np.asarray(palette_rgb, dtype=np.float64).reshape(-1, 3))
+
+    # Centro de cada celda del cubo
+    size = 1 << bits
+    shift = 8 - bits
+    levels = (np.arange(size) << shift) + (1 << shift) // 2
+    grid = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3)
+    grid_lab = rgb_to_lab(grid)
+
+    # deltaE 1976: distancia euclídea en CIELAB
+    best = np.zeros(len(grid_lab), dtype=np.uint8)
+    best_distance = np.full(len(grid_lab), np.inf)
+    for index, lab in enumerate(palette_lab):
+        distance = np.sum((grid_lab - lab) ** 2, axis=1)
+        closer = distance < best_distance
+        best[closer] = index
+        best_distance[closer] = distance[closer]
+
+    return best.reshape(size, size, size)
+
+
+def load_palette_lut(palette_rgb, path=PALETTE_LUT_FILE, bits=LUT_BITS):
+    """Carga la tabla de la caché en disco si corresponde a la misma paleta; si no, la construye y la guarda"""
+    palette = np.asarray(palette_rgb, dtype=np.uint8).reshape(-1, 3)
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if np.array_equal(data['palette'], palette) and data['lut'].shape == (1 << bits,) * 3:
+                    return data['lut']
+        except Exception as e:
+            print(f"⚠️ Tabla de paleta en caché no válida, se reconstruye: {e}")
+
+    lut = build_palette_lut(palette, bits)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, palette=palette, lut=lut)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar la tabla de paleta: {e}")
+    return lut
+
+
+def map_to_palette(image_array, lut, bits=LUT_BITS):
+    """Asigna a cada píxel el índice de su color de paleta más cercano con un único indexado"""
+    q = image_array[..., :3] >> (8 - bits)
+    return lut[q[..., 0], q[..., 1], q[..., 2]]
@@ -0,0 +1,112 @@
+import os
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+# Por debajo de estos píxeles arrancar procesos y copiar a memoria compartida no compensa
+PARALLEL_MIN_PIXELS = 1_000_000
+
+# Procesos del pool (uno por núcleo)
+MAX_WORKERS = os.cpu_count() or 1
+
+_executor = None
+
+
+def _get_executor():
+    """Pool de procesos compartido: se crea al primer uso y se reutiliza entre dibujos"""
+    global _executor
+    if _executor is None:
+        # 'spawn' en todas las plataformas: el pool se crea desde el hilo de preprocesado,
+        # y clonar con fork un proceso con hilos de Qt no es seguro
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def use_parallel(pixels, workers=None):
+    """Indica si una imagen de 'pixels' píxeles merece repartirse entre procesos"""
+    return (workers or MAX_WORKERS) > 1 and pixels >= PARALLEL_MIN_PIXELS
+
+
+def band_bounds(height, bands):
+    """Límites (y0, y1) de hasta 'bands' bandas de filas contiguas de alto lo más parecido posible"""
+    edges = np.linspace(0, height, max(1, bands) + 1).astype(int)
+    return [(int(y0), int(y1)) for y0, y1 in zip(edges[:-1], edges[1:]) if y1 > y0]
+
+
+class SharedArray:
+    """Array de numpy en memoria compartida: los procesos lo abren por su nombre sin copiarlo ni serializarlo"""
+
+    def __init__(self, shape, dtype, name=None):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+
+    @classmethod
+    def copy_of(cls, array):
+        """Crea un bloque compartido con una copia de 'array'"""
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        """Abre desde otro proceso el bloque descrito por 'spec' (nombre, forma, tipo)"""
+        name, shape, dtype = spec
+        return cls(shape, dtype, name)
+
+    def close(self, unlink=False):
+        """Suelta la vista y cierra el bloque; quien lo creó lo libera con unlink=True"""
+        self.array = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _run_band(func, y0, y1, input_specs, output_spec, kwargs):
+    """Trabajo de un proceso: aplica 'func' a las filas y0:y1 de las entradas y lo escribe en la salida"""
+    inputs = {key: SharedArray.attach(spec) for key, spec in input_specs.items()}
+    output = SharedArray.attach(output_spec)
+    try:
+        bands = {key: shared.array[y0:y1] for key, shared in inputs.items()}
+        output.array[y0:y1] = func(**bands, **kwargs)
+    finally:
+        bands = None
+        for shared in inputs.values():
+            shared.close()
+        output.close()
+
+
+def map_row_bands(func, arrays, out_dtype, workers=None, **kwargs):
+    """Aplica func(**bandas, **kwargs) por bandas de filas en el pool de procesos -> array (alto, ancho)
+
+    'arrays' asocia nombres de argumento con arrays que comparten el alto (None se pasa tal cual).
+    'func' debe ser una función de módulo que devuelva el resultado de sus filas. Las entradas y la
+    salida viajan por memoria compartida; si el pool no está disponible se calcula en este proceso.
+    """
+    global _executor
+    workers = workers or MAX_WORKERS
+    shared_inputs = {key: array for key, array in arrays.items() if array is not None}
+    fixed = {key: None for key, array in arrays.items() if array is None}
+    height, width = next(iter(shared_inputs.values())).shape[:2]
+
+    inputs = {key: SharedArray.copy_of(np.ascontiguousarray(array)) for key, array in shared_inputs.items()}
+    output = SharedArray((height, width), out_dtype)
+    try:
+        input_specs = {key: shared.spec for key, shared in inputs.items()}
+        futures = [_get_executor().submit(_run_band, func, y0, y1, input_specs, output.spec, {**fixed, **kwargs})
+                   for y0, y1 in band_bounds(height, workers)]
+        for future in futures:
+            future.result()
+        return output.array.copy()
+    except (BrokenProcessPool, OSError) as e:
+        _executor = None
+        print(f"⚠️ Pool de procesos no disponible ({e}); se procesa en un solo núcleo")
+        return func(**arrays, **kwargs)
+    finally:
+        for shared in inputs.values():
+            shared.close(unlink=True)
+        output.close(unlink=True)
@@ -0,0 +1,70 @@
+import queue
+import threading
+
+# Piezas del plan que el preprocesado puede adelantar al dibujo antes de esperar
+PIPELINE_DEPTH = 4
+
+# Intervalo (s) con el que el productor comprueba si el dibujo se ha cancelado mientras espera hueco
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+
+class PipelineClosed(Exception):
+    """El consumidor ha dejado de leer: el productor debe terminar"""
+
+
+class PlanPipeline:
+    """Productor/consumidor: un hilo prepara las piezas del plan y el dibujo las consume según están listas.
+
+    'produce(emit)' se ejecuta en el hilo productor y llama a emit(pieza) por cada pieza, en orden.
+    Al recorrer la tubería se obtienen las piezas; si el productor falla, su excepción se relanza aquí.
+    """
+
+    def __init__(self, produce, depth=PIPELINE_DEPTH):
+        self._produce = produce
+        self._queue = queue.Queue(maxsize=depth)
+        self._closed = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _put(self, item):
+        """Encola sin bloquear para siempre: si el consumidor cierra la tubería, se abandona"""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _emit(self, piece):
+        if not self._put(piece):
+            raise PipelineClosed()
+
+    def _run(self):
+        try:
+            self._produce(self._emit)
+        except PipelineClosed:
+            pass
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(_DONE)
+
+    def __iter__(self):
+        while True:
+            piece = self._queue.get()
+            if piece is _DONE:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield piece
+
+    def close(self):
+        """Deja de consumir: el productor se detiene en su siguiente pieza"""
+        self._closed.set()
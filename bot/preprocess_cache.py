@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Incrementar cuando cambie el preprocesado para invalidar las entradas antiguas
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_DIR = os.path.join('assets', 'cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Calcula el hash SHA-256 del contenido de un archivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PreprocessCache:
+    """Caché en disco del preprocesado (colores, mapa de etiquetas y plan) con expulsión LRU por tamaño"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, image_path, canvas_region, mode, params=None, image_hash=None):
+        """Genera la clave a partir del contenido de la imagen, la región del canvas, el modo y los parámetros
+
+        'image_hash' evita volver a leer el archivo si su hash ya se ha calculado.
+        """
+        description = {
+            'version': CACHE_VERSION,
+            'image': image_hash or hash_file(image_path),
+            'canvas_region': [int(v) for v in canvas_region],
+            'mode': mode,
+            'params': params or {},
+        }
+        encoded = json.dumps(description, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key):
+        """Devuelve los arrays guardados para la clave, o None si no existen"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            # Marcar como usada recientemente para la expulsión LRU
+            os.utime(path)
+            return arrays
+        except Exception as e:
+            print(f"⚠️ Entrada de caché corrupta, se descarta: {e}")
+            self._remove(path)
+            return None
+
+    def store(self, key, **arrays):
+        """Guarda los arrays bajo la clave y expulsa las entradas más antiguas si se supera el tamaño"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez_compressed(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            self._evict()
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la caché de preprocesado: {e}")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz') and '.tmp' not in name:
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
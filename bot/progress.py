@@ -0,0 +1,109 @@
+import time
+
+# Fases del dibujo que se anuncian en los eventos de progreso
+PHASES = ('preprocess', 'countdown', 'drawing', 'done', 'cancelled')
+
+# Intervalo mínimo (s) entre eventos mientras se dibuja, para no saturar la interfaz
+EMIT_INTERVAL = 0.25
+
+# Fracción del plan a partir de la cual el ritmo medido sustituye a la estimación en el tiempo restante
+MEASURED_ETA_FRACTION = 0.02
+
+
+class DrawingProgress:
+    """Lleva la cuenta del progreso del dibujo y lo emite como eventos estructurados (dict) a 'callback'.
+
+    Cada evento tiene: phase, layer, layers, strokes_done, strokes_total (None hasta tener una estimación),
+    estimated (True mientras strokes_total se extrapola de las capas ya compiladas), events_per_second,
+    color_switches, brush_switches y eta_seconds (None si aún no se sabe).
+    """
+
+    def __init__(self, callback=None, interval=EMIT_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.current_phase = 'preprocess'
+        self.layer_index = 0
+        self.layer_total = 0
+        self.strokes = 0
+        self.strokes_total = None
+        self.seconds_total = None
+        self.estimated = False
+        self.events = 0
+        self.color_switches = 0
+        self.brush_switches = 0
+        self._drawing_since = None
+        self._last_emit = 0.0
+
+    def phase(self, name):
+        """Cambia de fase y lo anuncia en el acto"""
+        if name not in PHASES:
+            raise ValueError(f"Fase de progreso desconocida: {name}")
+        self.current_phase = name
+        if name == 'drawing' and self._drawing_since is None:
+            self._drawing_since = time.monotonic()
+        self.emit()
+
+    def plan_ready(self, strokes_total, seconds_total, estimated=False):
+        """Registra el tamaño y la duración del plan; 'estimated' si aún faltan capas por compilar"""
+        self.strokes_total = int(strokes_total)
+        self.seconds_total = float(seconds_total)
+        self.estimated = estimated
+        self.emit()
+
+    def layers_planned(self, total):
+        """Anuncia cuántas capas se prevé dibujar"""
+        self.layer_total = total
+        self.emit()
+
+    def layer_skipped(self):
+        """Descuenta del total una capa que se ha quedado sin trazos al compilarla"""
+        self.layer_total = max(self.layer_index, self.layer_total - 1)
+        self.emit()
+
+    def layer(self, index, total):
+        """Empieza la capa 'index' (desde 1) de 'total'"""
+        self.layer_index, self.layer_total = index, total
+        self.emit()
+
+    def switched(self, color=False, brush=False):
+        """Cuenta un cambio de color y/o de pincel"""
+        self.color_switches += bool(color)
+        self.brush_switches += bool(brush)
+
+    def advance(self, strokes, events):
+        """Suma trazos y eventos de ratón reproducidos; emite como mucho cada 'interval' segundos"""
+        self.strokes += strokes
+        self.events += events
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def eta_seconds(self):
+        """Segundos de dibujo restantes: por el ritmo medido si ya hay avance, si no por la estimación del plan"""
+        if not self.strokes_total or self.seconds_total is None:
+            return None
+        fraction = min(1.0, self.strokes / self.strokes_total)
+        elapsed = time.monotonic() - self._drawing_since if self._drawing_since is not None else 0.0
+        if fraction >= MEASURED_ETA_FRACTION and elapsed > 0:
+            return elapsed * (1 - fraction) / fraction
+        return self.seconds_total * (1 - fraction)
+
+    def snapshot(self):
+        """Estado actual como evento de progreso"""
+        elapsed = time.monotonic() - self._drawing_since if self._drawing_since is not None else 0.0
+        return {
+            'phase': self.current_phase,
+            'layer': self.layer_index,
+            'layers': self.layer_total,
+            'strokes_done': self.strokes,
+            'strokes_total': self.strokes_total,
+            'estimated': self.estimated,
+            'events_per_second': self.events / elapsed if elapsed > 0 else 0.0,
+            'color_switches': self.color_switches,
+            'brush_switches': self.brush_switches,
+            'eta_seconds': 0.0 if self.current_phase in ('done', 'cancelled') else self.eta_seconds(),
+        }
+
+    def emit(self):
+        self._last_emit = time.monotonic()
+        if self.callback:
+            self.callback(self.snapshot())
@@ -0,0 +1,159 @@
+import numpy as np
+from bot.stroke_plan import STROKE_DTYPE
+from bot.stroke_order import scan_orientation, to_scan_frame, from_scan_frame
+
+
+def count_input_events(plan):
+    """Eventos de entrada que emite el plan: mover + pulsar + soltar por pulsación y un arrastre por segmento"""
+    if len(plan) == 0:
+        return 0
+    presses = int(np.count_nonzero(~plan['joined']))
+    moves = int(np.count_nonzero((plan['x_end'] != plan['x_start']) | (plan['y_end'] != plan['y'])))
+    return 3 * presses + moves
+
+
+def _to_image(line, along, orientation):
+    """Coordenadas (x, y) en la imagen de un punto (línea, posición) del sistema de barrido"""
+    if orientation == 'horizontal':
+        return along, line
+    if orientation == 'vertical':
+        return line, along
+    if orientation == 'diagonal':
+        return line + along, along
+    return line - along, along
+
+
+def _gaps_covered(lines, starts, lengths, later_mask, orientation):
+    """Indica para cada hueco (línea, primera posición, longitud) si todos sus píxeles se pintan después"""
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    xs, ys = _to_image(lines[owner], starts[owner] + offsets, orientation)
+    uncovered = ~later_mask[ys, xs].astype(bool)
+    return np.bincount(owner, weights=uncovered, minlength=len(lengths)) == 0
+
+
+def bridge_gaps(plan, max_gap, later_mask=None):
+    """Une los tramos de una misma línea de barrido separados por huecos pequeños -> (plan, tramos unidos)
+
+    Se une si el hueco mide como mucho 'max_gap' px (el pincel ya lo cubre casi entero) o, con
+    'later_mask', si todos sus píxeles los pinta una capa posterior. El plan debe ser de barrido
+    en una sola orientación; si no, se devuelve tal cual.
+    """
+    if len(plan) < 2 or plan['joined'].any():
+        return plan, 0
+    orientation = scan_orientation(plan)
+    if orientation is None:
+        return plan, 0
+
+    framed = to_scan_frame(plan, orientation)
+    left = np.minimum(framed['x_start'], framed['x_end']).astype(np.int64)
+    right = np.maximum(framed['x_start'], framed['x_end']).astype(np.int64)
+    lines = framed['y'].astype(np.int64)
+    order = np.lexsort((left, lines))
+    framed, left, right, lines = framed[order], left[order], right[order], lines[order]
+
+    gaps = left[1:] - right[:-1] - 1
+    same_line = lines[1:] == lines[:-1]
+    merge = same_line & (gaps <= max_gap)
+    if later_mask is not None:
+        candidates = np.flatnonzero(same_line & ~merge)
+        if len(candidates):
+            merge[candidates] = _gaps_covered(lines[candidates], right[candidates] + 1, gaps[candidates],
+                                              later_mask, orientation)
+
+    if not merge.any():
+        return plan, 0
+
+    # Cada tramo que no se une al anterior abre un grupo; el grupo va del primer inicio al último final
+    opens = np.concatenate(([True], ~merge))
+    firsts = np.flatnonzero(opens)
+    lasts = np.concatenate((firsts[1:] - 1, [len(framed) - 1]))
+    merged = framed[firsts].copy()
+    merged['x_start'], merged['x_end'] = left[firsts], right[lasts]
+    return from_scan_frame(merged, orientation), int(np.count_nonzero(merge))
+
+
+def zigzag_runs(plan, max_offset):
+    """Encadena tramos de líneas de barrido consecutivas en una sola pulsación en zigzag -> (plan, tramos unidos)
+
+    Un tramo se engancha al de la línea anterior si solo se tocan entre ellos y el extremo por el que
+    se sale de uno queda a 'max_offset' px o menos del extremo por el que se entra en el otro, de modo
+    que el tramo de unión queda dentro de la forma.
+    """
+    if len(plan) < 2 or plan['joined'].any():
+        return plan, 0
+    orientation = scan_orientation(plan)
+    if orientation is None:
+        return plan, 0
+
+    framed = to_scan_frame(plan, orientation)
+    left = np.minimum(framed['x_start'], framed['x_end']).astype(np.int64)
+    right = np.maximum(framed['x_start'], framed['x_end']).astype(np.int64)
+    lines = framed['y'].astype(np.int64)
+    order = np.lexsort((left, lines))
+    framed, left, right, lines = framed[order], left[order], right[order], lines[order]
+
+    unique_lines = np.unique(lines)
+    if len(unique_lines) < 2:
+        return plan, 0
+    step = int(np.min(np.diff(unique_lines)))
+
+    # Tramos de cada línea y cuántos tramos de la línea vecina toca cada uno
+    by_line = {}
+    for index, line in enumerate(lines.tolist()):
+        by_line.setdefault(line, []).append(index)
+
+    def touching(index, other_line):
+        candidates = by_line.get(other_line, [])
+        return [j for j in candidates if left[j] <= right[index] and right[j] >= left[index]]
+
+    chains = []
+    chain_of = {}
+    for index in range(len(framed)):
+        line = int(lines[index])
+        above = touching(index, line - step)
+        chain = None
+        if len(above) == 1 and len(touching(above[0], line)) == 1:
+            previous = above[0]
+            candidate = chain_of.get(previous)
+            if candidate is not None and chains[candidate][-1][0] == previous:
+                # Se sale del anterior por su final; se entra en este por el mismo lado
+                exit_at = right[previous] if chains[candidate][-1][1] else left[previous]
+                entry_at = right[index] if chains[candidate][-1][1] else left[index]
+                if abs(exit_at - entry_at) <= max_offset:
+                    chain = candidate
+        if chain is None:
+            chains.append([(index, True)])
+            chain_of[index] = len(chains) - 1
+        else:
+            # Dirección alternada: si el anterior iba hacia delante, este va hacia atrás
+            forward = not chains[chain][-1][1]
+            chains[chain].append((index, forward))
+            chain_of[index] = chain
+
+    if all(len(chain) == 1 for chain in chains):
+        return plan, 0
+
+    singles = [chain[0][0] for chain in chains if len(chain) == 1]
+    pieces = [from_scan_frame(framed[singles], orientation)]
+    for chain in chains:
+        if len(chain) == 1:
+            continue
+        # Polilínea: los puntos de entrada y salida de cada tramo, en orden
+        points = []
+        for index, forward in chain:
+            ends = (left[index], right[index]) if forward else (right[index], left[index])
+            points.extend(_to_image(int(lines[index]), int(along), orientation) for along in ends)
+        points = np.array(points, dtype=np.int64)
+
+        piece = np.empty(len(points) - 1, dtype=STROKE_DTYPE)
+        piece['x_start'], piece['y'] = points[:-1, 0], points[:-1, 1]
+        piece['x_end'], piece['y_end'] = points[1:, 0], points[1:, 1]
+        piece['color_id'] = framed['color_id'][chain[0][0]]
+        piece['brush_id'] = framed['brush_id'][chain[0][0]]
+        piece['joined'] = True
+        piece['joined'][0] = False
+        pieces.append(piece)
+
+    merged = sum(len(chain) - 1 for chain in chains)
+    return np.concatenate(pieces), merged
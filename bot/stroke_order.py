@@ -0,0 +1,197 @@
+import numpy as np
+
+# Métodos de ordenación disponibles para los trazos de cada capa
+ORDER_METHODS = ('raster', 'serpentine', 'nearest')
+
+
+def _group_bounds(plan):
+    """Devuelve los rangos [inicio, fin) de trazos consecutivos con el mismo color y pincel"""
+    if len(plan) == 0:
+        return []
+    changes = (np.diff(plan['color_id']) != 0) | (np.diff(plan['brush_id']) != 0)
+    cuts = np.concatenate(([0], np.flatnonzero(changes) + 1, [len(plan)]))
+    return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+
+def _polyline_strokes(strokes):
+    """Marca los trazos que forman parte de una polilínea: se mantienen juntos y en su orden"""
+    chained = strokes['joined'].copy()
+    chained[:-1] |= strokes['joined'][1:]
+    return chained
+
+
+def scan_orientation(strokes):
+    """Orientación común de los trazos de barrido (None si se mezclan varias)"""
+    dx = strokes['x_end'].astype(np.int64) - strokes['x_start']
+    dy = strokes['y_end'].astype(np.int64) - strokes['y']
+    found = set()
+    found.update(['horizontal'] if np.any((dy == 0) & (dx != 0)) else [])
+    found.update(['vertical'] if np.any((dx == 0) & (dy != 0)) else [])
+    found.update(['diagonal'] if np.any((dx == dy) & (dy != 0)) else [])
+    found.update(['antidiagonal'] if np.any((dx == -dy) & (dy != 0)) else [])
+    if len(found) > 1:
+        return None
+    return found.pop() if found else 'horizontal'
+
+
+def to_scan_frame(strokes, orientation):
+    """Expresa los trazos como si fueran filas: y = índice de la línea, x = posición a lo largo de ella"""
+    if orientation == 'horizontal':
+        return strokes.copy()
+    framed = strokes.copy()
+    if orientation == 'vertical':
+        line = strokes['x_start']
+    elif orientation == 'diagonal':
+        line = strokes['x_start'] - strokes['y']
+    else:
+        line = strokes['x_start'] + strokes['y']
+    framed['y'] = framed['y_end'] = line
+    framed['x_start'], framed['x_end'] = strokes['y'], strokes['y_end']
+    return framed
+
+
+def from_scan_frame(framed, orientation):
+    """Deshace to_scan_frame"""
+    if orientation == 'horizontal':
+        return framed
+    strokes = framed.copy()
+    line, along_start, along_end = framed['y'], framed['x_start'], framed['x_end']
+    strokes['y'], strokes['y_end'] = along_start, along_end
+    if orientation == 'vertical':
+        strokes['x_start'] = strokes['x_end'] = line
+    elif orientation == 'diagonal':
+        strokes['x_start'], strokes['x_end'] = line + along_start, line + along_end
+    else:
+        strokes['x_start'], strokes['x_end'] = line - along_start, line - along_end
+    return strokes
+
+
+def _order_scanlines(strokes, order_group):
+    """Ordena los trazos de barrido en el sistema de su orientación (filas, columnas o diagonales)"""
+    orientation = scan_orientation(strokes)
+    if orientation is None:
+        # Orientaciones mezcladas: se dejan como están
+        return strokes
+    return from_scan_frame(order_group(to_scan_frame(strokes, orientation)), orientation)
+
+
+def _span(strokes):
+    """Extremos izquierdo y derecho de cada trazo, sea cual sea su sentido"""
+    return (np.minimum(strokes['x_start'], strokes['x_end']),
+            np.maximum(strokes['x_start'], strokes['x_end']))
+
+
+def _serpentine(strokes):
+    """Ordena en zigzag (bustrofedón): las filas alternas se recorren de derecha a izquierda"""
+    left, right = _span(strokes)
+    _, row_rank = np.unique(strokes['y'], return_inverse=True)
+    backwards = (row_rank % 2) == 1
+
+    order = np.lexsort((np.where(backwards, -left, left), strokes['y']))
+    result = strokes[order].copy()
+    backwards = backwards[order]
+    result['x_start'] = np.where(backwards, right[order], left[order])
+    result['x_end'] = np.where(backwards, left[order], right[order])
+    return result
+
+
+def _components(strokes):
+    """Agrupa en componentes conexas los trazos que se solapan entre filas muestreadas consecutivas"""
+    count = len(strokes)
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    left, right = _span(strokes)
+    rows = np.unique(strokes['y'])
+    if len(rows) > 1:
+        # El paso de muestreo es la menor separación entre filas con trazos
+        step = int(np.min(np.diff(rows)))
+        by_row = {}
+        for row in rows.tolist():
+            indices = np.flatnonzero(strokes['y'] == row)
+            by_row[row] = indices[np.argsort(left[indices])]
+
+        for row in rows.tolist():
+            above = by_row.get(row - step)
+            if above is None:
+                continue
+            # Los tramos de una fila son disjuntos, así que inicios y finales están ordenados
+            above_left, above_right = left[above], right[above]
+            for i in by_row[row].tolist():
+                lo = np.searchsorted(above_right, left[i], side='left')
+                hi = np.searchsorted(above_left, right[i], side='right')
+                for j in above[lo:hi].tolist():
+                    root_i, root_j = find(i), find(j)
+                    if root_i != root_j:
+                        parent[root_j] = root_i
+
+    return np.array([find(i) for i in range(count)], dtype=np.int64)
+
+
+def _nearest(strokes):
+    """Recorre cada componente en zigzag y salta siempre a la componente más cercana al cursor"""
+    labels = _components(strokes)
+    pieces = [_serpentine(strokes[labels == label]) for label in np.unique(labels)]
+
+    # Punto de entrada y salida de cada componente (recorrida hacia delante)
+    entries = np.array([(piece['x_start'][0], piece['y'][0]) for piece in pieces], dtype=np.float64)
+    exits = np.array([(piece['x_end'][-1], piece['y'][-1]) for piece in pieces], dtype=np.float64)
+
+    remaining = np.ones(len(pieces), dtype=bool)
+    cursor = np.array([0.0, 0.0])
+    ordered = []
+    for _ in range(len(pieces)):
+        # Se puede entrar por el principio o, recorriéndola al revés, por el final
+        forward = np.hypot(*(entries - cursor).T)
+        backward = np.hypot(*(exits - cursor).T)
+        forward[~remaining] = np.inf
+        backward[~remaining] = np.inf
+
+        best_forward, best_backward = int(np.argmin(forward)), int(np.argmin(backward))
+        if forward[best_forward] <= backward[best_backward]:
+            piece = pieces[best_forward]
+            remaining[best_forward] = False
+        else:
+            piece = pieces[best_backward][::-1].copy()
+            piece['x_start'], piece['x_end'] = piece['x_end'].copy(), piece['x_start'].copy()
+            remaining[best_backward] = False
+
+        ordered.append(piece)
+        cursor = np.array([piece['x_end'][-1], piece['y'][-1]], dtype=np.float64)
+
+    return np.concatenate(ordered)
+
+
+def order_plan(plan, method='serpentine'):
+    """Reordena los trazos de cada capa para minimizar el recorrido del puntero, sin cambiar el orden de las capas"""
+    if method not in ORDER_METHODS:
+        raise ValueError(f"Método de ordenación desconocido: {method}")
+    if method == 'raster' or len(plan) == 0:
+        return plan
+
+    order_group = _serpentine if method == 'serpentine' else _nearest
+
+    ordered = []
+    for start, stop in _group_bounds(plan):
+        strokes = plan[start:stop]
+        paths = _polyline_strokes(strokes)
+        if not paths.all():
+            ordered.append(_order_scanlines(strokes[~paths], order_group))
+        # Las polilíneas de contorno van detrás del relleno, sin reordenar sus segmentos
+        if paths.any():
+            ordered.append(strokes[paths])
+    return np.concatenate(ordered)
+
+
+def travel_distance(plan):
+    """Distancia total (px) que recorre el puntero sin pintar entre el final de un trazo y el inicio del siguiente"""
+    if len(plan) < 2:
+        return 0.0
+    dx = plan['x_start'][1:].astype(np.float64) - plan['x_end'][:-1]
+    dy = plan['y'][1:].astype(np.float64) - plan['y_end'][:-1]
+    return float(np.sum(np.hypot(dx, dy)))
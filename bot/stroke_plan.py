@@ -0,0 +1,167 @@
+import numpy as np
+
+# Un trazo es un segmento (x_start, y) -> (x_end, y_end) dibujado con un color y un pincel.
+# Los de barrido son horizontales (y_end == y); 'joined' indica que el segmento continúa el
+# anterior sin levantar el ratón (polilíneas de contorno)
+STROKE_DTYPE = np.dtype([
+    ('y', np.int32),
+    ('x_start', np.int32),
+    ('x_end', np.int32),
+    ('y_end', np.int32),
+    ('color_id', np.int16),
+    ('brush_id', np.int8),
+    ('joined', np.bool_),
+])
+
+# Orientaciones de las líneas de barrido: filas, columnas y las dos diagonales a 45°
+SCAN_ORIENTATIONS = ('horizontal', 'vertical', 'diagonal', 'antidiagonal')
+
+# Pausas del bucle de dibujo original (segundos)
+STROKE_DELAY_BEFORE = 0.02
+STROKE_DELAY_AFTER = 0.03
+STROKE_DRAG_DURATION = 0.01
+
+
+def empty_plan():
+    """Devuelve un plan de trazos vacío"""
+    return np.empty(0, dtype=STROKE_DTYPE)
+
+
+def _scan_lines(shape, step, orientation):
+    """Coordenadas (ys, xs) de las líneas de barrido muestreadas: una fila por línea, -1 fuera de la capa.
+
+    Las diagonales se separan round(step·√2) en el eje x para que su distancia perpendicular sea 'step'.
+    """
+    height, width = shape
+    step = max(1, int(step))
+    if orientation == 'horizontal':
+        rows = np.arange(0, height, step)
+        return np.repeat(rows[:, None], width, axis=1), np.broadcast_to(np.arange(width), (len(rows), width))
+    if orientation == 'vertical':
+        cols = np.arange(0, width, step)
+        return np.broadcast_to(np.arange(height), (len(cols), height)), np.repeat(cols[:, None], height, axis=1)
+    if orientation not in SCAN_ORIENTATIONS:
+        raise ValueError(f"Orientación de barrido desconocida: {orientation}")
+
+    # Diagonales x - y = d o antidiagonales x + y = d, recorridas de arriba abajo
+    spacing = max(1, int(round(step * np.sqrt(2))))
+    ys = np.arange(height)
+    if orientation == 'diagonal':
+        xs = np.arange(-(height - 1), width, spacing)[:, None] + ys[None, :]
+    else:
+        xs = np.arange(0, height + width - 1, spacing)[:, None] - ys[None, :]
+    ys = np.broadcast_to(ys, xs.shape)
+    outside = (xs < 0) | (xs >= width)
+    return np.where(outside, -1, ys), np.where(outside, -1, xs)
+
+
+def scan_line_mask(shape, step=1, orientation='horizontal'):
+    """Máscara de los píxeles por los que pasan las líneas de barrido muestreadas"""
+    ys, xs = _scan_lines(shape, step, orientation)
+    inside = ys >= 0
+    mask = np.zeros(shape, dtype=np.uint8)
+    mask[ys[inside], xs[inside]] = 1
+    return mask
+
+
+def compile_layer(layer, step=1, color_id=0, brush_id=0, orientation='horizontal'):
+    """Convierte una capa (255 = dibujar) en un plan de trazos, muestreando una línea de barrido cada 'step'"""
+    mask = np.asarray(layer) > 0
+    if orientation == 'horizontal':
+        # Caso habitual: las filas muestreadas se toman directamente
+        rows = np.arange(0, mask.shape[0], max(1, int(step)))
+        sampled = mask[rows]
+    else:
+        ys, xs = _scan_lines(mask.shape, step, orientation)
+        sampled = np.zeros(ys.shape, dtype=bool)
+        inside = ys >= 0
+        sampled[inside] = mask[ys[inside], xs[inside]]
+
+    # Los bordes de cada tramo aparecen como +1 / -1 al derivar la línea rellenada con ceros
+    padded = np.pad(sampled, ((0, 0), (1, 1))).astype(np.int8)
+    edges = np.diff(padded, axis=1)
+    lines, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    ends -= 1
+
+    plan = np.empty(len(starts), dtype=STROKE_DTYPE)
+    if orientation == 'horizontal':
+        plan['y'] = plan['y_end'] = rows[lines]
+        plan['x_start'], plan['x_end'] = starts, ends
+    else:
+        plan['y'], plan['x_start'] = ys[lines, starts], xs[lines, starts]
+        plan['y_end'], plan['x_end'] = ys[lines, ends], xs[lines, ends]
+    plan['color_id'] = color_id
+    plan['brush_id'] = brush_id
+    plan['joined'] = False
+    return plan
+
+
+def compile_best_orientation(layer, step=1, color_id=0, brush_id=0, orientations=None,
+                             delay_before=STROKE_DELAY_BEFORE, delay_after=STROKE_DELAY_AFTER,
+                             drag_duration=STROKE_DRAG_DURATION):
+    """Compila la capa en cada orientación de barrido y se queda con la más rápida -> (plan, orientación)"""
+    best_plan, best_orientation, best_seconds = None, None, None
+    for orientation in orientations or SCAN_ORIENTATIONS:
+        plan = compile_layer(layer, step, color_id, brush_id, orientation)
+        seconds = estimate_duration(plan, delay_before, delay_after, drag_duration)
+        # A igualdad de tiempo se prefiere el orden de la lista (horizontal primero)
+        if best_seconds is None or seconds < best_seconds:
+            best_plan, best_orientation, best_seconds = plan, orientation, seconds
+    return best_plan, best_orientation
+
+
+def compile_polylines(polylines, color_id=0, brush_id=0):
+    """Convierte polilíneas (arrays de puntos (x, y)) en segmentos encadenados: una sola pulsación por polilínea"""
+    plans = []
+    for points in polylines:
+        points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        if len(points) == 0:
+            continue
+        # Un solo punto se dibuja como un clic (segmento de longitud cero)
+        starts = points[:-1] if len(points) > 1 else points
+        ends = points[1:] if len(points) > 1 else points
+
+        plan = np.empty(len(starts), dtype=STROKE_DTYPE)
+        plan['x_start'], plan['y'] = starts[:, 0], starts[:, 1]
+        plan['x_end'], plan['y_end'] = ends[:, 0], ends[:, 1]
+        plan['color_id'] = color_id
+        plan['brush_id'] = brush_id
+        plan['joined'] = True
+        plan['joined'][0] = False
+        plans.append(plan)
+    return concat_plans(plans)
+
+
+def concat_plans(plans):
+    """Une varios planes en uno solo conservando el orden"""
+    plans = [plan for plan in plans if len(plan)]
+    if not plans:
+        return empty_plan()
+    return np.concatenate(plans)
+
+
+def split_by_color(plan):
+    """Divide el plan en grupos consecutivos con el mismo color_id -> [(color_id, trazos)]"""
+    if len(plan) == 0:
+        return []
+    boundaries = np.flatnonzero(np.diff(plan['color_id'])) + 1
+    return [(int(group['color_id'][0]), group) for group in np.split(plan, boundaries)]
+
+
+def split_by_unit(plan):
+    """Divide el plan en grupos consecutivos con el mismo color y pincel -> [(color_id, brush_id, trazos)]"""
+    if len(plan) == 0:
+        return []
+    changes = (np.diff(plan['color_id']) != 0) | (np.diff(plan['brush_id']) != 0)
+    boundaries = np.flatnonzero(changes) + 1
+    return [(int(group['color_id'][0]), int(group['brush_id'][0]), group) for group in np.split(plan, boundaries)]
+
+
+def estimate_duration(plan, delay_before=STROKE_DELAY_BEFORE, delay_after=STROKE_DELAY_AFTER,
+                      drag_duration=STROKE_DRAG_DURATION):
+    """Estima los segundos que tardará en ejecutarse el plan"""
+    # Las pausas se pagan una vez por pulsación; los segmentos encadenados solo arrastran
+    presses = np.count_nonzero(~plan['joined'])
+    drags = np.count_nonzero((plan['x_end'] != plan['x_start']) | (plan['y_end'] != plan['y']))
+    return presses * (delay_before + delay_after) + drags * drag_duration
@@ -0,0 +1,82 @@
+from bot.stroke_plan import concat_plans, split_by_unit
+
+# Estrategias que se comparan al programar las unidades (color, pincel)
+SCHEDULE_STRATEGIES = ('color', 'brush', 'greedy')
+
+
+def _switch_counts(units, sequence):
+    """Cambios de color y de pincel que hace una secuencia de unidades, incluida la primera selección"""
+    color_switches = brush_switches = 0
+    current_color = current_brush = None
+    for index in sequence:
+        color_id, brush_id, _ = units[index]
+        color_switches += color_id != current_color
+        brush_switches += brush_id != current_brush
+        current_color, current_brush = color_id, brush_id
+    return color_switches, brush_switches
+
+
+def _greedy_sequence(units, color_switch_cost, brush_switch_cost):
+    """Elige en cada paso la unidad disponible más barata desde el color y pincel actuales"""
+    # Cola de unidades pendientes de cada color, del pincel más grueso al más fino
+    pending = {}
+    for index, (color_id, _, _) in enumerate(units):
+        pending.setdefault(color_id, []).append(index)
+
+    sequence = []
+    current_color = current_brush = None
+    while pending:
+        def cost(index):
+            color_id, brush_id, _ = units[index]
+            switch = (color_id != current_color) * color_switch_cost + (brush_id != current_brush) * brush_switch_cost
+            return switch, brush_id, index
+
+        best = min((queue[0] for queue in pending.values()), key=cost)
+        current_color, current_brush, _ = units[best]
+        sequence.append(best)
+        pending[current_color].pop(0)
+        if not pending[current_color]:
+            del pending[current_color]
+    return sequence
+
+
+def schedule_units(plan, color_switch_cost, brush_switch_cost):
+    """Reordena las unidades (color, pincel) del plan para gastar lo mínimo en cambios de color y de pincel.
+
+    Dentro de cada color se respeta el orden del plan (pinceles gruesos antes que finos).
+    Se prueban varias estrategias y se queda la más barata.
+    Devuelve el plan reordenado y un resumen con los cambios previstos.
+    """
+    units = split_by_unit(plan)
+    if not units:
+        return plan, {'strategy': 'color', 'color_switches': 0, 'brush_switches': 0, 'seconds': 0.0}
+
+    original = list(range(len(units)))
+    sequences = {
+        'color': original,
+        'brush': sorted(original, key=lambda index: (units[index][1], index)),
+        'greedy': _greedy_sequence(units, color_switch_cost, brush_switch_cost),
+    }
+
+    best = None
+    for strategy in SCHEDULE_STRATEGIES:
+        color_switches, brush_switches = _switch_counts(units, sequences[strategy])
+        seconds = color_switches * color_switch_cost + brush_switches * brush_switch_cost
+        if best is None or seconds < best['seconds']:
+            best = {'strategy': strategy, 'color_switches': color_switches,
+                    'brush_switches': brush_switches, 'seconds': seconds}
+
+    scheduled = concat_plans([units[index][2] for index in sequences[best['strategy']]])
+    return scheduled, best
+
+
+def chain_units(plan, current_brush=None):
+    """Invierte el orden de las unidades de una capa si así empieza con el pincel que ya está seleccionado.
+
+    Se usa al dibujar capa a capa sin conocer el plan completo: los pinceles se recorren
+    de grueso a fino y de fino a grueso alternativamente, ahorrando un cambio de pincel por capa.
+    """
+    units = split_by_unit(plan)
+    if len(units) < 2 or units[0][1] == current_brush or units[-1][1] != current_brush:
+        return plan
+    return concat_plans([strokes for _, _, strokes in reversed(units)])